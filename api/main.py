@@ -1,62 +1,448 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
-import shutil
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+import asyncio
+import glob
+import hashlib
+import json
 import os
+import queue
 import sys
+import threading
+import time
+import uuid
+from typing import Optional
 
 # Add project root to sys path to import core
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from core.pipeline import VideoProcessor
-from core.settings import OUTPUT_DIR, DATA_DIR
+from core.cache import ResultCache
+from core.jobs import JobManager
+from core.metrics import REGISTRY, Registry, merge, render
+from core.video_io import writes_video
+from core.settings import (
+    OUTPUT_DIR, DATA_DIR, UPLOAD_CHUNK_SIZE, MAX_UPLOAD_BYTES, TEMP_INPUT_MAX_AGE, ensure_dirs,
+)
 
 app = FastAPI(title="Bird Counting API")
 
 # Mount output directory for static file access (video playback)
+ensure_dirs()
 app.mount("/output", StaticFiles(directory=OUTPUT_DIR), name="output")
 
+# Worker pool for video processing, created on startup
+jobs = None
+
+# Finished results by content hash, and the jobs currently producing one (cache key -> job id)
+cache = None
+in_flight = {}
+in_flight_lock = threading.Lock()
+
+# Annotated video inside a cache entry directory
+_CACHED_VIDEO_FILE = "processed.mp4"
+
+# Parts of a job result that are cached and returned
+_RESULT_FIELDS = ("stats", "tracks_sample", "weight_estimates", "skip_report", "artifacts")
+
+# Live stream counters by stream id
+streams = {}
+
+
+# Shared-model scheduler for registered cameras, created with the first camera
+scheduler = None
+
+
+class StreamRequest(BaseModel):
+    url: str  # RTSP / camera URL, or a local file to replay in real time
+
+
+class CameraRequest(BaseModel):
+    camera_id: str
+    url: str
+    target_fps: Optional[float] = None
+
+
+@app.on_event("startup")
+def start_job_manager():
+    global jobs, cache
+    _sweep_temp_inputs()
+    cache = ResultCache()
+    jobs = JobManager()
+    # Spawn the workers now, each loads and warms up its model pool in the background
+    jobs.warm_up()
+
+
+@app.on_event("shutdown")
+def stop_job_manager():
+    for counter in streams.values():
+        counter.stop()
+    if scheduler is not None:
+        scheduler.stop()
+    if jobs is not None:
+        jobs.shutdown()
+
+
+def _sweep_temp_inputs(max_age=TEMP_INPUT_MAX_AGE):
+    # Uploads left behind by a crashed or killed server
+    cutoff = time.time() - max_age
+    for path in glob.glob(os.path.join(DATA_DIR, "temp_input_*")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _remove_input(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def _upload_chunks(file):
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def _save_upload(chunks, filename):
+    # Streams the upload to disk chunk by chunk (bounded memory) and hashes it on the way,
+    # so the cache key is known as soon as the last chunk lands. Returns (input_path, sha256).
+    # Unique temp name, so concurrent uploads with the same filename do not clobber each other
+    input_path = os.path.join(DATA_DIR, f"temp_input_{uuid.uuid4().hex[:8]}_{os.path.basename(filename)}")
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(input_path, "wb") as buffer:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Upload larger than {MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        _remove_input(input_path)
+        raise
+    return input_path, digest.hexdigest()
+
+
+def _store_result(key, future):
+    # Cache first, then leave in_flight: a re-upload in between always finds one of the two
+    if future.exception() is None:
+        result = future.result()
+        cache.put(key, {name: result[name] for name in _RESULT_FIELDS})
+    else:
+        cache.discard(key)
+    with in_flight_lock:
+        in_flight.pop(key, None)
+
+
+def _submit(input_path, video_hash, filename, stream=False):
+    # Blocking (cache lookup), call through run_in_threadpool. Owns input_path until a job takes it over
+    try:
+        key = cache.key(video_hash, filename)
+    except BaseException:
+        _remove_input(input_path)
+        raise
+
+    # Define output path, inside the cache entry so it is unique per content. Fixed name: a later
+    # upload of the same video under another filename is served this entry's file
+    output_filename = _CACHED_VIDEO_FILE
+    output_path = os.path.join(cache.entry_dir(key), output_filename)
+    # No video in stats-only mode, the job still writes its artifacts next to output_path
+    video = writes_video()
+    info = {
+        "filename": filename,
+        "cache_key": key,
+        "video_url": f"/output/cache/{key}/{output_filename}" if video else None,
+        "video_path": output_path if video else None, # For local access flexibility
+    }
+
+    # Same video already analysed (or being analysed) with the same model and settings
+    while True:
+        # Unpickling a cached result can take a while, never under in_flight_lock
+        cached = cache.get(key)
+        with in_flight_lock:
+            job_id = in_flight.get(key)
+            submitted = job_id is None and cached is None and not cache.contains(key)
+            if submitted:
+                os.makedirs(cache.entry_dir(key), exist_ok=True)
+                try:
+                    # The worker removes the temp input once the job is done
+                    job_id = jobs.submit(input_path, output_path, remove_input=True, stream=stream, cached=False, **info)
+                except BaseException:
+                    # No job took the upload (e.g. the executor is shut down)
+                    _remove_input(input_path)
+                    cache.discard(key)
+                    raise
+                in_flight[key] = job_id
+        if submitted or job_id is not None or cached is not None:
+            break
+        # A job finished and cached this video right after the lookup above: read it again
+    if submitted:
+        # Outside the lock: a job that already failed runs the callback right here, and it takes the lock
+        jobs.future(job_id).add_done_callback(lambda f: _store_result(key, f))
+        return job_id
+
+    _remove_input(input_path)
+    if cached is not None:
+        return jobs.add_completed(cached, cached=True, **info)
+    return job_id
+
+
+async def _submit_upload(file, stream=False):
+    input_path, video_hash = await _save_upload(_upload_chunks(file), file.filename)
+    return await run_in_threadpool(_submit, input_path, video_hash, file.filename, stream)
+
+
+async def _submit_raw(request, filename, stream=False):
+    # Raw request body: chunks are written while they arrive, nothing is spooled by the multipart parser first
+    input_path, video_hash = await _save_upload(request.stream(), filename)
+    return await run_in_threadpool(_submit, input_path, video_hash, filename, stream)
+
+
+def _job_links(job_id):
+    return {"job_id": job_id, "status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"}
+
+
+def _response(job_id, result):
+    state = jobs.status(job_id)
+    artifacts = [f"/output/cache/{state['cache_key']}/{name}" for name in result["artifacts"]]
+    return {
+        "message": "Processing complete",
+        "job_id": job_id,
+        "video_url": state["video_url"],
+        "video_path": state["video_path"],
+        # Columnar: {"frame": [...], "bird_count": [...], ...}
+        "stats": {name: values.tolist() for name, values in result["stats"].items()},
+        "tracks_sample": result["tracks_sample"],
+        "weight_estimates": result["weight_estimates"],
+        "skip_report": result["skip_report"],
+        "cached": state["cached"],
+        "artifacts": ([state["video_url"]] if state["video_url"] else []) + artifacts,
+    }
+
+
 @app.get("/health")
 async def health_check():
+    # Liveness: answers as soon as the app is up, models may still be loading (see /ready)
     return {"status": "ok", "message": "Service is running"}
 
+@app.get("/ready")
+def readiness():
+    # Readiness: 503 until every job worker has its models loaded
+    workers = jobs.workers_ready()
+    ready = workers >= jobs.max_workers
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "ready": ready,
+        "job_workers_ready": workers,
+        "job_workers": jobs.max_workers,
+    })
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+@app.get("/metrics/models")
+async def model_metrics():
+    return jobs.model_metrics()
+
+def _scrape_metrics():
+    # Point-in-time values read at scrape time, next to the counters/histograms the pipelines keep
+    scrape = Registry()
+    counts = jobs.job_counts()
+    by_status = scrape.gauge("bird_jobs", "Jobs known to this instance, by status", ("status",))
+    for status, n in counts.items():
+        by_status.set(n, status=status)
+    scrape.gauge("bird_active_jobs", "Jobs queued or running").set(counts["queued"] + counts["running"])
+
+    cache_stats = cache.stats()
+    lookups = scrape.counter("bird_cache_lookups_total", "Result cache lookups", ("result",))
+    lookups.inc(cache_stats["hits"], result="hit")
+    lookups.inc(cache_stats["misses"], result="miss")
+    scrape.gauge("bird_cache_bytes", "Size of the result cache on disk").set(cache_stats["bytes"])
+
+    lag = scrape.gauge("bird_stream_lag_seconds", "Capture-to-count delay of the latest frame", ("source",))
+    dropped = scrape.counter("bird_stream_frames_dropped_total", "Frames dropped because counting could not keep up", ("source",))
+    sources = [(stream_id, counter.status()) for stream_id, counter in list(streams.items())]
+    if scheduler is not None:
+        sources += [(camera["camera_id"], camera) for camera in scheduler.stats()["per_camera"]]
+    for source, status in sources:
+        lag.set(status["lag_seconds"], source=source)
+        dropped.inc(status["source"]["frames_dropped"], source=source)
+    return scrape.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format: this process (live streams, cameras),
+    # every job worker process and the scrape-time gauges, merged
+    snapshot = merge([REGISTRY.snapshot(), *jobs.metrics_snapshots(), _scrape_metrics()])
+    return PlainTextResponse(render(snapshot), media_type="text/plain; version=0.0.4")
+
 @app.post("/analyze_video")
 async def analyze_video(file: UploadFile = File(...)):
+    # Same job queue as /jobs, but waits for the result (without blocking the event loop)
     try:
-        # Save uploaded file
-        input_path = os.path.join(DATA_DIR, f"temp_input_{file.filename}")
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Define output path
-        output_filename = f"processed_{file.filename}"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-        
-        # Process video
-        processor = VideoProcessor(input_path, output_path)
-        df = processor.process_video()
-        
-        # Prepare response
-        stats = df.to_dict(orient="records")
-        video_url = f"/output/{output_filename}"
-        
-        # Clean up input file (optional, keeping for debug)
-        # os.remove(input_path) 
-        
-        return JSONResponse(content={
-            "message": "Processing complete",
-            "video_url": video_url,
-            "video_path": output_path, # For local access flexibility
-            "stats": stats
-        })
+        job_id = await _submit_upload(file)
+        result = await asyncio.wrap_future(jobs.future(job_id))
+        return JSONResponse(content=_response(job_id, result))
 
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _stats_rows(stats):
+    # Columnar stats -> one dict per frame, like the records the pipeline yields
+    names = list(stats)
+    return [dict(zip(names, values)) for values in zip(*(stats[name].tolist() for name in names))]
+
+def _stream_job(job_id):
+    # NDJSON: a "start" line, one "frame" line per frame as the job worker reports it, then an "end" line.
+    # The 200 status is sent before processing starts, so failures end the stream with an "error" line.
+    # Inference runs on the job workers like any other upload (queued, cached); Starlette iterates this in a thread.
+    state = jobs.status(job_id)
+    future = jobs.future(job_id)
+    events = jobs.events(job_id)
+
+    def start(total_frames):
+        return json.dumps({
+            "event": "start", "job_id": job_id, "video_url": state["video_url"], "total_frames": total_frames,
+        }) + "\n"
+
+    started = False
+    try:
+        while events is not None:
+            try:
+                item = events.get(timeout=1.0)
+            except queue.Empty:
+                if future.done():
+                    break  # the worker died before it could close the stream
+                continue
+            if item is None:
+                break
+            total_frames, records = item
+            if not started:
+                started = True
+                yield start(total_frames)
+            for record in records:
+                yield json.dumps({"event": "frame", **record}) + "\n"
+
+        result = future.result()
+        if not started:
+            # Served from the cache, or by a job another upload of the same video started: replay its stats
+            rows = _stats_rows(result["stats"])
+            yield start(len(rows))
+            for row in rows:
+                yield json.dumps({"event": "frame", **row}) + "\n"
+        yield json.dumps({
+            "event": "end",
+            "skip_report": result["skip_report"],
+            "weight_estimates": result["weight_estimates"],
+        }) + "\n"
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+
+@app.post("/analyze_video/stream")
+async def analyze_video_stream(file: UploadFile = File(...)):
+    job_id = await _submit_upload(file, stream=True)
+    return StreamingResponse(_stream_job(job_id), media_type="application/x-ndjson")
+
+@app.post("/analyze_video/stream/raw")
+async def analyze_video_stream_raw(request: Request, filename: str = "upload.mp4"):
+    # Body is the video itself (Content-Type: application/octet-stream)
+    job_id = await _submit_raw(request, os.path.basename(filename), stream=True)
+    return StreamingResponse(_stream_job(job_id), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    return _job_links(await _submit_upload(file))
+
+@app.post("/jobs/raw", status_code=202)
+async def create_job_raw(request: Request, filename: str = "upload.mp4"):
+    # Body is the video itself (Content-Type: application/octet-stream)
+    return _job_links(await _submit_raw(request, os.path.basename(filename)))
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    state = jobs.status(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return state
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    state = jobs.status(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if state["status"] == "failed":
+        raise HTTPException(status_code=500, detail=state["error"])
+    if state["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {state['status']}")
+    return JSONResponse(content=_response(job_id, jobs.result(job_id)))
+
+@app.post("/streams", status_code=201)
+def start_stream(request: StreamRequest):
+    # Each stream gets its own model and tracker and runs until deleted
+    from core.stream import StreamCounter
+
+    stream_id = uuid.uuid4().hex[:12]
+    streams[stream_id] = StreamCounter(request.url, source=stream_id).start()
+    return {"stream_id": stream_id, "status_url": f"/streams/{stream_id}"}
+
+@app.get("/streams")
+async def list_streams():
+    return {stream_id: counter.status() for stream_id, counter in streams.items()}
+
+@app.get("/streams/{stream_id}")
+async def stream_status(stream_id: str):
+    if stream_id not in streams:
+        raise HTTPException(status_code=404, detail=f"Unknown stream: {stream_id}")
+    return streams[stream_id].status()
+
+@app.delete("/streams/{stream_id}")
+def stop_stream(stream_id: str):
+    counter = streams.pop(stream_id, None)
+    if counter is None:
+        raise HTTPException(status_code=404, detail=f"Unknown stream: {stream_id}")
+    counter.stop()
+    return counter.status()
+
+@app.post("/cameras", status_code=201)
+def add_camera(request: CameraRequest):
+    global scheduler
+    from core.scheduler import MultiCameraScheduler
+    from core.settings import CAMERA_TARGET_FPS
+
+    if scheduler is None:
+        scheduler = MultiCameraScheduler().start()
+    try:
+        scheduler.add_camera(request.camera_id, request.url, request.target_fps or CAMERA_TARGET_FPS)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"camera_id": request.camera_id, "status_url": "/cameras"}
+
+@app.get("/cameras")
+async def camera_stats():
+    # Per-camera lag / throughput plus node utilization
+    if scheduler is None:
+        return {"cameras": 0, "per_camera": []}
+    return scheduler.stats()
+
+@app.delete("/cameras/{camera_id}")
+def remove_camera(camera_id: str):
+    if scheduler is None or camera_id not in scheduler.feeds:
+        raise HTTPException(status_code=404, detail=f"Unknown camera: {camera_id}")
+    return scheduler.remove_camera(camera_id).stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+
+# Add project root to sys path to import core
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ultralytics.engine.results import Results
+from core.annotate import draw_annotations, frame_summary, weight_proxies
+
+
+def make_result(frame, n_birds, rng):
+    # Tracked result with n random boxes: x1, y1, x2, y2, id, conf, cls
+    h, w = frame.shape[:2]
+    xy = rng.uniform([0, 0], [w - 80, h - 80], size=(n_birds, 2))
+    wh = rng.uniform(20, 80, size=(n_birds, 2))
+    data = np.concatenate([
+        xy, xy + wh, np.arange(1, n_birds + 1)[:, None],
+        np.full((n_birds, 1), 0.9), np.zeros((n_birds, 1)),
+    ], axis=1)
+    return Results(frame, path="", names={0: "Chicken"}, boxes=torch.as_tensor(data, dtype=torch.float32))
+
+
+def legacy(frame, result):
+    # The per-box loop process_video used before: tensor element math, plot() + putText per bird
+    weights = []
+    boxes = result.boxes.xywh.cpu()
+    track_ids = result.boxes.id.int().cpu().tolist()
+    annotated = result.plot()
+    for box, track_id in zip(boxes, track_ids):
+        x, y, w, h = box
+        weight_proxy = float(w * h)
+        weights.append(weight_proxy)
+        cv2.putText(annotated, f"W:{weight_proxy:.0f}", (int(x - w/2), int(y - h/2) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    return annotated, np.mean(weights)
+
+
+def vectorized(frame, result, labels=True, draw=True):
+    xywh = result.boxes.xywh.cpu().numpy()
+    track_ids = result.boxes.id.int().cpu().numpy()
+    weights = weight_proxies(xywh)
+    count, avg_weight = frame_summary(weights)
+    if draw:
+        draw_annotations(frame, xywh, track_ids, weights, count, len(track_ids), labels=labels)
+    return frame, avg_weight
+
+
+def timeit(fn, frame, result, repeat):
+    times = []
+    for _ in range(repeat):
+        canvas = frame.copy()
+        start = time.perf_counter()
+        fn(canvas, result)
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame stats + annotation cost at different bird densities")
+    parser.add_argument("--densities", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, size=(args.height, args.width, 3), dtype=np.uint8)
+    variants = [
+        ("legacy loop", legacy),
+        ("single pass", vectorized),
+        ("no labels", lambda f, r: vectorized(f, r, labels=False)),
+        ("stats only", lambda f, r: vectorized(f, r, draw=False)),
+    ]
+
+    print(f"median ms per frame, {args.width}x{args.height}")
+    print(f"{'birds':>6} " + " ".join(f"{name:>12}" for name, _ in variants))
+    for n_birds in args.densities:
+        result = make_result(frame, n_birds, rng)
+        row = [timeit(fn, frame, result, args.repeat) for _, fn in variants]
+        print(f"{n_birds:>6} " + " ".join(f"{ms:>12.2f}" for ms in row))
+
+
+if __name__ == "__main__":
+    main()
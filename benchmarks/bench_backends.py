@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# CPU numbers only
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+# Add project root to sys path to import core
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_batch_size import load_frames
+from core.backends import BACKENDS, load_model
+from core.pipeline import detect
+from core.tracking import FrameTracker
+
+
+def box_iou(a, b):
+    # Pairwise IoU of two (N, 4) / (M, 4) xyxy arrays
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def run(backend, frames, batch_size):
+    model = load_model(backend)
+    detect(model, frames[:1])  # warm-up
+    tracker = FrameTracker()
+    outputs = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        for result in detect(model, frames[i:i + batch_size]):
+            result = tracker.update(result)
+            ids = result.boxes.id.int().tolist() if result.boxes.id is not None else []
+            outputs.append((result.boxes.xyxy.cpu().numpy(), ids))
+    return len(frames) / (time.perf_counter() - start), outputs
+
+
+def compare(reference, candidate):
+    # Share of frames with the same count, and mean IoU of the best match per reference box
+    same_count, ious = 0, []
+    for (ref_boxes, ref_ids), (boxes, ids) in zip(reference, candidate):
+        same_count += len(ref_ids) == len(ids)
+        if len(ref_boxes) and len(boxes):
+            ious.extend(box_iou(ref_boxes, boxes).max(axis=1))
+        elif len(ref_boxes):
+            ious.extend([0.0] * len(ref_boxes))
+    return same_count / max(len(reference), 1), float(np.mean(ious)) if ious else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity and CPU throughput of the inference backends vs PyTorch")
+    parser.add_argument("video", help="Video to benchmark (e.g. data/sample_video.mp4)")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"], choices=BACKENDS)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--min-count-match", type=float, default=0.95,
+                        help="Fail if fewer frames than this have the same bird count as PyTorch")
+    parser.add_argument("--min-iou", type=float, default=0.9, help="Fail if the mean box IoU is lower")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames)
+    base_fps, reference = run("torch", frames, args.batch_size)
+
+    print(f"{len(frames)} frames from {args.video}, batch size {args.batch_size}")
+    print(f"{'backend':>10} {'fps':>8} {'speedup':>8} {'count match':>12} {'mean IoU':>9}")
+    print(f"{'torch':>10} {base_fps:>8.2f} {1.0:>8.2f} {1.0:>12.3f} {1.0:>9.3f}")
+
+    failed = False
+    for backend in args.backends:
+        fps, outputs = run(backend, frames, args.batch_size)
+        count_match, mean_iou = compare(reference, outputs)
+        ok = count_match >= args.min_count_match and mean_iou >= args.min_iou
+        failed |= not ok
+        print(f"{backend:>10} {fps:>8.2f} {fps / base_fps:>8.2f} {count_match:>12.3f} {mean_iou:>9.3f}"
+              + ("" if ok else "  PARITY FAILED"))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
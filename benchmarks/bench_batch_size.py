@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+# CPU numbers only
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+# Add project root to sys path to import core
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ultralytics import YOLO
+from core import settings
+from core.pipeline import detect
+from core.settings import MODEL_PATH, CONFIDENCE_THRESHOLD, IOU_THRESHOLD, TRACKER_CONFIG
+from core.tracking import FrameTracker
+
+
+def load_frames(video_path, max_frames):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video: {video_path}")
+    frames = []
+    while len(frames) < max_frames:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def track_ids(result):
+    return result.boxes.id.int().tolist() if result.boxes.id is not None else []
+
+
+def track_reference(frames):
+    # What the batched path must reproduce: per-frame model.track(persist=True), on its own model
+    # instance (model.track registers tracker callbacks on the model it runs on)
+    model = YOLO(MODEL_PATH)
+    ids = []
+    for frame in frames:
+        result = model.track(
+            frame, persist=True, tracker=TRACKER_CONFIG, conf=CONFIDENCE_THRESHOLD, iou=IOU_THRESHOLD,
+            classes=settings.TARGET_CLASS_IDS, verbose=False,
+        )[0]
+        ids.append(track_ids(result))
+    return ids
+
+
+def run(model, frames, batch_size):
+    # Detection on batches + tracker updates in frame order, same as VideoProcessor
+    tracker = FrameTracker()
+    ids = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        for result in detect(model, frames[i:i + batch_size]):
+            result = tracker.update(result)
+            ids.append(track_ids(result))
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frames/sec of batched detection + tracking on CPU")
+    parser.add_argument("video", help="Video to benchmark (e.g. data/sample_video.mp4)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--frames", type=int, default=200, help="Number of frames to use")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames)
+    model = YOLO(MODEL_PATH)
+    # Warm-up so the first measured batch does not pay for model fusing
+    detect(model, frames[:1])
+
+    print(f"{len(frames)} frames from {args.video}, model {MODEL_PATH}")
+    reference = track_reference(frames)
+    print(f"{'batch':>6} {'fps':>8} {'ids match model.track':>22}")
+    mismatched = []
+    for batch_size in args.batch_sizes:
+        fps, ids = run(model, frames, batch_size)
+        if ids != reference:
+            mismatched.append(batch_size)
+        print(f"{batch_size:>6} {fps:>8.2f} {str(ids == reference):>22}")
+
+    if mismatched:
+        print(f"Track IDs differ from model.track(persist=True) at batch sizes {mismatched}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
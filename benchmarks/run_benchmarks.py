@@ -0,0 +1,149 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add project root to sys path to import core and create_dummy_video
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from create_dummy_video import create_synthetic_video
+from core.settings import BATCH_SIZE, INFERENCE_BACKEND
+
+
+def _parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def run_case(video_path, output_path, pipelined, batch_size, annotate, repeat):
+    # Runs in a fresh process, so the peak RSS belongs to this case alone
+    from core.backends import load_model
+    from core.pipeline import VideoProcessor, detect
+    from core.profiling import StageProfiler, peak_rss_bytes
+
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    _, first = cap.read()
+    cap.release()
+
+    model = load_model()
+    start = time.perf_counter()
+    detect(model, [first])
+    warm_up = time.perf_counter() - start
+
+    profiler = StageProfiler()
+    frames = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        processor = VideoProcessor(
+            video_path, output_path, model=model, pipelined=pipelined, batch_size=batch_size,
+            annotate=annotate, keep_results=False, profiler=profiler,
+        )
+        for _ in processor.iter_frames():
+            frames += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed else 0.0,
+        "warm_up_seconds": round(warm_up, 3),
+        "peak_rss_mb": round(peak_rss_bytes() / 1024**2, 1),
+        "stages": profiler.summary(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against `baseline`: fps drops or p50 stage latencies above the tolerance."""
+    regressions = []
+    for name, case in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        if case["fps"] < base["fps"] * (1 - tolerance):
+            regressions.append(f"{name}: fps {base['fps']} -> {case['fps']}")
+        if case["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {base['peak_rss_mb']} MB -> {case['peak_rss_mb']} MB")
+        for stage, stats in case["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if base_stats and stats["p50_ms"] > base_stats["p50_ms"] * (1 + tolerance):
+                regressions.append(f"{name}: {stage} p50 {base_stats['p50_ms']} ms -> {stats['p50_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end VideoProcessor benchmark on synthetic videos, with per-stage timings")
+    parser.add_argument("--resolutions", nargs="+", default=["640x360", "1280x720", "1920x1080"])
+    parser.add_argument("--birds", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--seconds", type=float, default=5, help="Duration of every synthetic video")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over every video")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--serial", action="store_true", help="Disable the decode/encode threads")
+    parser.add_argument("--no-annotate", action="store_true", help="Analytics only, no output video")
+    parser.add_argument("--video-dir", help="Keep the synthetic videos here (reused between runs)")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--save-baseline", help="Also write the report here as the new baseline")
+    parser.add_argument("--baseline", help="Compare against this report, exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before it counts as a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_dir = args.video_dir or tmp
+        os.makedirs(video_dir, exist_ok=True)
+
+        report = {
+            "config": {
+                "backend": INFERENCE_BACKEND,
+                "batch_size": args.batch_size,
+                "pipelined": not args.serial,
+                "annotate": not args.no_annotate,
+                "seconds": args.seconds,
+                "fps": args.fps,
+                "repeat": args.repeat,
+                "cpu_count": os.cpu_count(),
+            },
+            "cases": {},
+        }
+        for resolution in args.resolutions:
+            width, height = _parse_resolution(resolution)
+            for n_birds in args.birds:
+                name = f"{width}x{height}_{n_birds}birds"
+                video_path = os.path.join(video_dir, f"synthetic_{name}_{args.seconds:g}s_{args.fps}fps.mp4")
+                if not os.path.exists(video_path):
+                    create_synthetic_video(video_path, width, height, n_birds, args.seconds, args.fps)
+
+                # One process per case: a clean peak RSS and no warm caches from the previous case
+                with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+                    report["cases"][name] = executor.submit(
+                        run_case, video_path, os.path.join(tmp, f"out_{name}.mp4"),
+                        not args.serial, args.batch_size, not args.no_annotate, args.repeat,
+                    ).result()
+                print(f"{name}: {report['cases'][name]['fps']} fps", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
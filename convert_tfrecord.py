@@ -1,114 +1,247 @@
-
-import tensorflow as tf
 import os
-import io
-from PIL import Image
-
-def parse_tfrecord_fn(example):
-    feature_description = {
-        'image/height': tf.io.FixedLenFeature([], tf.int64),
-        'image/width': tf.io.FixedLenFeature([], tf.int64),
-        'image/filename': tf.io.FixedLenFeature([], tf.string),
-        'image/encoded': tf.io.FixedLenFeature([], tf.string),
-        'image/object/bbox/xmin': tf.io.VarLenFeature(tf.float32),
-        'image/object/bbox/xmax': tf.io.VarLenFeature(tf.float32),
-        'image/object/bbox/ymin': tf.io.VarLenFeature(tf.float32),
-        'image/object/bbox/ymax': tf.io.VarLenFeature(tf.float32),
-        'image/object/class/label': tf.io.VarLenFeature(tf.int64),
-    }
-    return tf.io.parse_single_example(example, feature_description)
-
-def convert_dataset(tfrecord_path, output_images_dir, output_labels_dir):
+import struct
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Features of a Roboflow TFRecord Example that the conversion needs
+FEATURES = (
+    'image/filename',
+    'image/encoded',
+    'image/object/bbox/xmin',
+    'image/object/bbox/xmax',
+    'image/object/bbox/ymin',
+    'image/object/bbox/ymax',
+    'image/object/class/label',
+)
+
+def read_tfrecord(tfrecord_path, chunk_size=1 << 20):
+    """Yield the raw records of a TFRecord file, without TensorFlow.
+
+    Every record is: uint64 length, uint32 masked CRC of the length, data, uint32 masked CRC of the data.
+    CRCs are not verified (CRC32C is not in the standard library); truncated files raise.
+    """
+    with open(tfrecord_path, 'rb', buffering=chunk_size) as f:
+        while True:
+            header = f.read(12)
+            if not header:
+                return
+            if len(header) < 12:
+                raise ValueError(f"Truncated record header in {tfrecord_path}")
+            length, = struct.unpack('<Q', header[:8])
+            data = f.read(length)
+            if len(data) < length or len(f.read(4)) < 4:
+                raise ValueError(f"Truncated record in {tfrecord_path}")
+            yield data
+
+def _varint(buf, pos):
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+def _fields(buf):
+    # (field number, wire type, value) of a protobuf message: an int for varints, a memoryview otherwise
+    pos, end = 0, len(buf)
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        field, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _varint(buf, pos)
+        elif wire == 2:
+            n, pos = _varint(buf, pos)
+            value = buf[pos:pos + n]
+            pos += n
+        elif wire == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        elif wire == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire}")
+        yield field, wire, value
+
+def _feature_values(feature):
+    # tf.train.Feature is a oneof: 1 = BytesList, 2 = FloatList, 3 = Int64List (each has `repeated value = 1`)
+    for kind, _, values in _fields(feature):
+        items = [(wire, value) for _, wire, value in _fields(values)]
+        if kind == 1:
+            return [value for _, value in items]
+        if kind == 2:
+            # Packed (one LEN blob) or unpacked (one 4-byte value each), little-endian float32 either way
+            return np.frombuffer(b''.join(value for _, value in items), dtype='<f4')
+        if kind == 3:
+            ints = []
+            for wire, value in items:
+                if wire == 0:
+                    ints.append(value)
+                else:
+                    pos = 0
+                    while pos < len(value):
+                        n, pos = _varint(value, pos)
+                        ints.append(n)
+            # int64 is two's complement in a varint
+            return np.array([n - (1 << 64) if n >= 1 << 63 else n for n in ints], dtype=np.int64)
+    return []
+
+def parse_example(record, wanted=FEATURES):
+    """Parse a serialized tf.train.Example into {feature name: values} for the `wanted` features.
+
+    Bytes features come back as memoryviews into `record` (no copy), floats and ints as NumPy arrays.
+    """
+    features = {}
+    for field, _, example_features in _fields(memoryview(record)):
+        if field != 1:  # Example.features
+            continue
+        for _, _, entry in _fields(example_features):  # map<string, Feature> entries
+            key = value = None
+            for f, _, v in _fields(entry):
+                if f == 1:
+                    key = bytes(v).decode('utf-8')
+                elif f == 2:
+                    value = v
+            if key in wanted and value is not None:
+                features[key] = _feature_values(value)
+    return features
+
+def _batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _image_name(features):
+    image_name = bytes(features['image/filename'][0]).decode('utf-8')
+    # Some TFRecords might not have extension in filename
+    if not image_name.endswith('.jpg') and not image_name.endswith('.png'):
+        image_name += ".jpg"
+    return image_name
+
+def yolo_label_lines(examples):
+    """YOLO label text (class x_center y_center width height, normalized) of every example, all boxes at once."""
+    def column(name, dtype):
+        return np.concatenate([np.asarray(e.get(name, []), dtype=dtype) for e in examples]) if examples else np.zeros(0, dtype)
+
+    counts = np.array([len(e.get('image/object/bbox/xmin', [])) for e in examples], dtype=np.int64)
+    # Roboflow TFRecord: xmin, ymin, xmax, ymax are NORMALIZED [0,1]
+    xmin, xmax = column('image/object/bbox/xmin', np.float32), column('image/object/bbox/xmax', np.float32)
+    ymin, ymax = column('image/object/bbox/ymin', np.float32), column('image/object/bbox/ymax', np.float32)
+    # CAUTION: 'Chicken' id=1 in pbtxt. YOLO needs 0.
+    labels = column('image/object/class/label', np.int64) - 1
+
+    # Convert to center_x, center_y, width, height, clipped to [0, 1] just in case
+    width, height = xmax - xmin, ymax - ymin
+    boxes = np.clip(np.stack([xmin + width / 2, ymin + height / 2, width, height], axis=1), 0, 1)
+
+    lines = [f"{label} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n" for label, (x, y, w, h) in zip(labels.tolist(), boxes.tolist())]
+    offsets = np.concatenate([[0], np.cumsum(counts)]).tolist()
+    return [''.join(lines[start:end]) for start, end in zip(offsets[:-1], offsets[1:])]
+
+def _write_atomic(path, data):
+    # Write to a temp name first, so an interrupted run never leaves a half-written file that looks converted.
+    # Unique per write: records sharing an image filename are written by different threads at the same time
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.part"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _write_example(image_path, image_raw, label_path, label_text):
+    # Label first: in incremental mode an existing image means the example is complete
+    if label_text:
+        _write_atomic(label_path, label_text.encode('utf-8'))
+    _write_atomic(image_path, image_raw)
+
+def convert_dataset(tfrecord_path, output_images_dir, output_labels_dir, batch_size=256, workers=8, incremental=False):
+    """Convert a Roboflow TFRecord file to YOLO images + label files.
+
+    Records are streamed from disk and parsed in batches of `batch_size`; box
+    conversion runs on all boxes of a batch at once and files are written by
+    `workers` threads while the next batch is parsed. With `incremental=True`,
+    examples whose image already exists in `output_images_dir` are skipped.
+    """
     os.makedirs(output_images_dir, exist_ok=True)
     os.makedirs(output_labels_dir, exist_ok=True)
-    
-    raw_dataset = tf.data.TFRecordDataset(tfrecord_path)
-    parsed_dataset = raw_dataset.map(parse_tfrecord_fn)
-    
-    count = 0
-    for features in parsed_dataset:
-        # Save Image
-        image_raw = features['image/encoded'].numpy()
-        image_name = features['image/filename'].numpy().decode('utf-8')
-        
-        # Some TFRecords might not have extension in filename
-        if not image_name.endswith('.jpg') and not image_name.endswith('.png'):
-            image_name += ".jpg"
-            
-        image_path = os.path.join(output_images_dir, image_name)
-        with open(image_path, 'wb') as f:
-            f.write(image_raw)
-            
-        # Process Labels
-        # YOLO format: class x_center y_center width height (normalized)
-        
-        # Check if any objects exist
-        if features['image/object/bbox/xmin'].values.shape[0] > 0:
-            xmins = features['image/object/bbox/xmin'].values.numpy()
-            xmaxs = features['image/object/bbox/xmax'].values.numpy()
-            ymins = features['image/object/bbox/ymin'].values.numpy()
-            ymaxs = features['image/object/bbox/ymax'].values.numpy()
-            labels = features['image/object/class/label'].values.numpy()
-            
-            label_file = os.path.splitext(image_name)[0] + ".txt"
-            label_path = os.path.join(output_labels_dir, label_file)
-            
-            with open(label_path, 'w') as f:
-                for i in range(len(labels)):
-                    # Roboflow TFRecord: xmin, ymin, xmax, ymax are NORMALIZED [0,1]
-                    xmin = xmins[i]
-                    ymin = ymins[i]
-                    xmax = xmaxs[i]
-                    ymax = ymaxs[i]
-                    label = labels[i] - 1  # 1-indexed to 0-indexed for YOLO
-                    # CAUTION: 'Chicken' id=1 in pbtxt. YOLO needs 0.
-                    
-                    # Convert to center_x, center_y, width, height
-                    width = xmax - xmin
-                    height = ymax - ymin
-                    x_center = xmin + width / 2
-                    y_center = ymin + height / 2
-                    
-                    # Clip to [0, 1] just in case
-                    x_center = max(0, min(1, x_center))
-                    y_center = max(0, min(1, y_center))
-                    width = max(0, min(1, width))
-                    height = max(0, min(1, height))
-                    
-                    f.write(f"{label} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
-        
-        count += 1
-        if count % 10 == 0:
-            print(f"Processed {count} images...", end='\r')
-            
-    print(f"\nFinished converting {tfrecord_path}. Total: {count}")
+    done = set(os.listdir(output_images_dir)) if incremental else set()
+
+    count = skipped = 0
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for records in _batches(read_tfrecord(tfrecord_path), batch_size):
+            examples = [parse_example(record) for record in records]
+            names = [_image_name(e) for e in examples]
+            todo = [i for i, name in enumerate(names) if name not in done]
+            skipped += len(examples) - len(todo)
+            examples = [examples[i] for i in todo]
+            names = [names[i] for i in todo]
+
+            futures = []
+            for features, image_name, label_text in zip(examples, names, yolo_label_lines(examples)):
+                futures.append(pool.submit(
+                    _write_example,
+                    os.path.join(output_images_dir, image_name),
+                    features['image/encoded'][0],
+                    os.path.join(output_labels_dir, os.path.splitext(image_name)[0] + ".txt"),
+                    label_text,
+                ))
+
+            # At most two batches in flight: the one being written and the one just parsed
+            for future in pending:
+                future.result()
+            pending = futures
+            count += len(futures)
+            print(f"Processed {count} images ({skipped} skipped)...", end='\r')
+
+        for future in pending:
+            future.result()
+
+    print(f"\nFinished converting {tfrecord_path}. Total: {count}, skipped: {skipped}")
+    return count
 
 if __name__ == "__main__":
-    BASE_DIR = "d:/ML project/Bird Counting"
-    
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert the Roboflow TFRecords to a YOLO dataset")
+    parser.add_argument("--batch-size", type=int, default=256, help="Records parsed per batch")
+    parser.add_argument("--workers", type=int, default=8, help="File writer threads")
+    parser.add_argument("--incremental", action="store_true", help="Skip images that were already converted")
+    args = parser.parse_args()
+    options = dict(batch_size=args.batch_size, workers=args.workers, incremental=args.incremental)
+
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
     # Train
     TRAIN_RECORD = os.path.join(BASE_DIR, "train", "Chickens.tfrecord")
     TRAIN_IMG_DIR = os.path.join(BASE_DIR, "yolo_data", "images", "train")
     TRAIN_LBL_DIR = os.path.join(BASE_DIR, "yolo_data", "labels", "train")
-    
+
     if os.path.exists(TRAIN_RECORD):
         print(f"Converting Train: {TRAIN_RECORD}")
-        convert_dataset(TRAIN_RECORD, TRAIN_IMG_DIR, TRAIN_LBL_DIR)
-        
+        convert_dataset(TRAIN_RECORD, TRAIN_IMG_DIR, TRAIN_LBL_DIR, **options)
+
     # Valid
     VAL_RECORD = os.path.join(BASE_DIR, "valid", "Chickens.tfrecord")
     VAL_IMG_DIR = os.path.join(BASE_DIR, "yolo_data", "images", "val")
     VAL_LBL_DIR = os.path.join(BASE_DIR, "yolo_data", "labels", "val")
-    
+
     if os.path.exists(VAL_RECORD):
         print(f"Converting Val: {VAL_RECORD}")
-        convert_dataset(VAL_RECORD, VAL_IMG_DIR, VAL_LBL_DIR)
-    
+        convert_dataset(VAL_RECORD, VAL_IMG_DIR, VAL_LBL_DIR, **options)
+
     # Test (Optional, usually used for final eval)
     TEST_RECORD = os.path.join(BASE_DIR, "test", "Chickens.tfrecord")
     TEST_IMG_DIR = os.path.join(BASE_DIR, "yolo_data", "images", "test")
     TEST_LBL_DIR = os.path.join(BASE_DIR, "yolo_data", "labels", "test")
-    
+
     if os.path.exists(TEST_RECORD):
         print(f"Converting Test: {TEST_RECORD}")
-        convert_dataset(TEST_RECORD, TEST_IMG_DIR, TEST_LBL_DIR)
+        convert_dataset(TEST_RECORD, TEST_IMG_DIR, TEST_LBL_DIR, **options)
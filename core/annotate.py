@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+
+BOX_COLOR = (0, 255, 0)
+TEXT_COLOR = (0, 255, 0)
+
+
+def weight_proxies(xywh):
+    """Weight proxy (box area w * h) of every box in an (N, 4) xywh array."""
+    return xywh[:, 2] * xywh[:, 3]
+
+
+def frame_summary(weights):
+    # Bird count and mean weight proxy of one frame
+    count = len(weights)
+    return count, float(weights.mean()) if count else 0.0
+
+
+def draw_annotations(frame, xywh, track_ids, weights, count, total_ids, labels=True):
+    """Draw boxes, per-bird labels and the global stats onto `frame` in place, in a single pass.
+
+    All boxes go out in one cv2.polylines call; only the labels need one
+    cv2.putText per bird, and `labels=False` skips those for very dense frames.
+    """
+    if len(xywh):
+        half = xywh[:, 2:] / 2
+        corners = np.concatenate([xywh[:, :2] - half, xywh[:, :2] + half], axis=1).round().astype(np.int32)
+        x1, y1, x2, y2 = corners.T
+        polygons = np.stack([
+            np.stack([x1, y1], axis=1), np.stack([x2, y1], axis=1),
+            np.stack([x2, y2], axis=1), np.stack([x1, y2], axis=1),
+        ], axis=1)
+        cv2.polylines(frame, list(polygons), True, BOX_COLOR, 2)
+
+        if labels:
+            # Track ID + Weight Proxy above each box
+            for left, top, track_id, weight in zip(x1.tolist(), y1.tolist(), track_ids.tolist(), np.rint(weights).astype(np.int64).tolist()):
+                cv2.putText(frame, f"{track_id} W:{weight}", (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, TEXT_COLOR, 2)
+
+    # Overlay Global Stats
+    cv2.putText(frame, f"Count: {count}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, TEXT_COLOR, 2)
+    cv2.putText(frame, f"Total IDs: {total_ids}", (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, TEXT_COLOR, 2)
+    return frame
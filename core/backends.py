@@ -0,0 +1,70 @@
+import os
+
+from . import settings
+from .settings import INFERENCE_BACKEND
+
+# Inference backends that can be chosen in settings (INFERENCE_BACKEND)
+BACKENDS = ("torch", "onnx", "onnx-int8", "openvino")
+
+
+# ultralytics (and torch) are imported on first use, so importing this module stays cheap.
+# Model paths are read from settings at call time, they are resolved lazily there.
+
+def export_onnx(weights=None, output_path=None):
+    # dynamic=True so batched detection (BATCH_SIZE > 1) works with the exported graph
+    from ultralytics import YOLO
+
+    weights = weights or settings.MODEL_PATH
+    output_path = output_path or settings.ONNX_MODEL_PATH
+    path = YOLO(weights).export(format="onnx", dynamic=True, simplify=True)
+    if os.path.abspath(path) != os.path.abspath(output_path):
+        os.replace(path, output_path)
+    return output_path
+
+
+def quantize_onnx(onnx_path=None, output_path=None):
+    # Dynamic INT8 quantization of the weights, needs no calibration images
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    onnx_path = onnx_path or settings.ONNX_MODEL_PATH
+    output_path = output_path or settings.ONNX_INT8_MODEL_PATH
+
+    if not os.path.exists(onnx_path):
+        export_onnx(output_path=onnx_path)
+    quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+    return output_path
+
+
+def export_openvino(weights=None, output_path=None):
+    from ultralytics import YOLO
+
+    weights = weights or settings.MODEL_PATH
+    output_path = output_path or settings.OPENVINO_MODEL_PATH
+    path = YOLO(weights).export(format="openvino", dynamic=True)
+    if os.path.abspath(path) != os.path.abspath(output_path):
+        os.replace(path, output_path)
+    return output_path
+
+
+def resolve_weights(backend=INFERENCE_BACKEND):
+    """Path of the weights for `backend`, exporting / quantizing them on first use."""
+    if backend == "torch":
+        return settings.MODEL_PATH
+    if backend == "onnx":
+        return settings.ONNX_MODEL_PATH if os.path.exists(settings.ONNX_MODEL_PATH) else export_onnx()
+    if backend == "onnx-int8":
+        return settings.ONNX_INT8_MODEL_PATH if os.path.exists(settings.ONNX_INT8_MODEL_PATH) else quantize_onnx()
+    if backend == "openvino":
+        return settings.OPENVINO_MODEL_PATH if os.path.exists(settings.OPENVINO_MODEL_PATH) else export_openvino()
+    raise ValueError(f"Unknown inference backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+def load_model(backend=INFERENCE_BACKEND):
+    """Load the detector for the configured backend.
+
+    Exported models go through the same ultralytics YOLO wrapper (ONNX Runtime /
+    OpenVINO underneath), so pre/postprocessing, NMS and tracking are unchanged.
+    """
+    from ultralytics import YOLO
+
+    return YOLO(resolve_weights(backend), task="detect")
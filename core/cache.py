@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+
+from . import settings
+from .regions import roi_for
+
+# Settings that change the analysis result, part of every cache key
+_KEY_SETTINGS = (
+    "CONFIDENCE_THRESHOLD", "IOU_THRESHOLD", "TARGET_CLASS_IDS", "TRACKER_CONFIG", "INFERENCE_BACKEND",
+    "INFERENCE_STRIDE", "MOTION_THRESHOLD", "MOTION_MAX_SKIP", "MOTION_DOWNSCALE_WIDTH",
+    "ANNOTATE_VIDEO", "ANNOTATION_LABELS", "WEIGHT_SKETCH_BINS", "WEIGHT_SKETCH_RANGE", "WEIGHT_MIN_OBSERVATIONS",
+    "TILE_SIZE", "TILE_OVERLAP", "TILE_FULL_FRAME", "TILE_MERGE_THRESHOLD",
+    "VIDEO_WRITER", "VIDEO_CRF", "VIDEO_PRESET", "OUTPUT_WIDTH", "OUTPUT_FPS",
+)
+
+_RESULT_FILE = "result.pkl"
+
+
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Finished analyses on disk, keyed by video content + model weights + thresholds + the source's ROI.
+
+    Every entry is a directory holding the annotated video, the artifacts and the
+    pickled result. Jobs write their output straight into the entry directory, so
+    two different uploads with the same filename never clobber each other. When
+    the cache grows past `max_bytes`, the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir=settings.CACHE_DIR, max_bytes=settings.CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self._weights_hashes = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        # key -> [last used, size] of complete entries: scanned once here, then kept up to date by
+        # get / put / discard, so stats and eviction never walk the cache directory
+        self.entries = {key: [last_used, size] for last_used, size, key in self._scan()}
+
+    def _weights_hash(self):
+        path = settings.MODEL_PATH
+        if not os.path.exists(path):
+            # Stock weights fetched by name (e.g. yolov8n.pt)
+            return path
+        stamp = (path, os.path.getmtime(path))
+        if stamp not in self._weights_hashes:
+            self._weights_hashes[stamp] = hash_file(path)
+        return self._weights_hashes[stamp]
+
+    def key(self, video_hash, source_name=None):
+        config = {name: getattr(settings, name) for name in _KEY_SETTINGS}
+        # The ROI is picked by upload filename, so the same video under another name can need another analysis
+        config["roi"] = roi_for(source_name, settings.ROI_POLYGONS)
+        payload = json.dumps([video_hash, self._weights_hash(), config], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def contains(self, key):
+        # Complete entry, without reading it
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        path = os.path.join(self.entry_dir(key), _RESULT_FILE)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            with self.lock:
+                self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used (also for the next startup scan)
+        with self.lock:
+            self.hits += 1
+            if key in self.entries:
+                self.entries[key][0] = time.time()
+        return result
+
+    def put(self, key, result):
+        # The entry's files are already in place, writing the result completes it
+        path = os.path.join(self.entry_dir(key), _RESULT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f)
+        os.replace(tmp_path, path)
+        size = self._entry_size(key)
+        with self.lock:
+            self.entries[key] = [time.time(), size]
+        self.evict(keep=key)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+    def _entry_size(self, key):
+        return sum(entry.stat().st_size for entry in os.scandir(self.entry_dir(key)) if entry.is_file())
+
+    def _scan(self):
+        # (last used, size, key) of complete entries on disk; in-progress ones have no result file yet
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            result_path = os.path.join(self.entry_dir(key), _RESULT_FILE)
+            if not os.path.exists(result_path):
+                continue
+            entries.append((os.path.getmtime(result_path), self._entry_size(key), key))
+        return entries
+
+    def evict(self, keep=None):
+        with self.lock:
+            total = sum(size for _, size in self.entries.values())
+            victims = []
+            for key, (_, size) in sorted(self.entries.items(), key=lambda item: item[1][0]):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                victims.append(key)
+                total -= size
+            for key in victims:
+                del self.entries[key]
+            self.evictions += len(victims)
+        # Deleting files is slow, never under the lock
+        for key in victims:
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": sum(size for _, size in self.entries.values()),
+                "max_bytes": self.max_bytes,
+            }
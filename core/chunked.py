@@ -0,0 +1,183 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from .results_store import ResultStore
+from .settings import CHUNK_WORKERS, CHUNK_OVERLAP_FRAMES, CHUNK_MATCH_IOU
+from .weights import TrackWeightAggregator
+
+
+def plan_segments(total_frames, n_segments, overlap):
+    """Split [0, total_frames) into (read_start, start, end) segments.
+
+    Every segment owns frames [start, end) but starts reading `overlap` frames
+    earlier, so its tracker is warmed up and its tracks can be matched against
+    the previous segment's tracks on the shared frames.
+    """
+    n_segments = max(1, min(n_segments, total_frames // max(overlap, 1) or 1))
+    bounds = np.linspace(0, total_frames, n_segments + 1).round().astype(int)
+    segments = []
+    for i, (start, end) in enumerate(zip(bounds[:-1].tolist(), bounds[1:].tolist())):
+        last = i == n_segments - 1
+        # The last segment reads to the end of the file, frame counts in containers are not always exact
+        segments.append((max(0, start - overlap), start, None if last else end))
+    return segments
+
+
+def _init_segment_worker(threads):
+    # Split the cores between the workers instead of every worker using all of them
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _run_segment(source_video_path, read_start, end):
+    # Runs inside a worker process, analytics only (no annotated video)
+    from .model_pool import get_model_pool
+    from .pipeline import VideoProcessor
+
+    with get_model_pool().acquire() as model:
+        processor = VideoProcessor(
+            source_video_path, None, model=model, annotate=False, pipelined=False,
+            start_frame=read_start, end_frame=end,
+        )
+        for _ in processor.iter_frames():
+            pass
+    return processor.store.frames.columns(), processor.store.tracks.columns()
+
+
+def _box_iou(a, b):
+    # Pairwise IoU of (N, 4) and (M, 4) xywh arrays
+    a1, a2 = a[:, :2] - a[:, 2:] / 2, a[:, :2] + a[:, 2:] / 2
+    b1, b2 = b[:, :2] - b[:, 2:] / 2, b[:, :2] + b[:, 2:] / 2
+    inter = np.prod(np.clip(np.minimum(a2[:, None], b2[None]) - np.maximum(a1[:, None], b1[None]), 0, None), axis=2)
+    union = np.prod(a[:, 2:], axis=1)[:, None] + np.prod(b[:, 2:], axis=1)[None] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def _boxes(tracks, mask):
+    return np.stack([tracks[name][mask] for name in ("x", "y", "w", "h")], axis=1)
+
+
+def match_tracks(prev_tracks, tracks, frames, min_iou=CHUNK_MATCH_IOU):
+    """Map track IDs of a segment to the previous segment's IDs by box overlap on shared frames."""
+    votes = {}
+    for frame in frames:
+        prev_mask = prev_tracks["frame"] == frame
+        mask = tracks["frame"] == frame
+        if not prev_mask.any() or not mask.any():
+            continue
+        iou = _box_iou(_boxes(tracks, mask), _boxes(prev_tracks, prev_mask))
+        best = iou.argmax(axis=1)
+        for track_id, prev_idx, overlap in zip(tracks["track_id"][mask].tolist(), best.tolist(), iou.max(axis=1).tolist()):
+            if overlap >= min_iou:
+                pair = (track_id, int(prev_tracks["track_id"][prev_mask][prev_idx]))
+                votes[pair] = votes.get(pair, 0) + 1
+
+    # One-to-one, strongest agreement first
+    mapping, used = {}, set()
+    for (track_id, prev_id), _ in sorted(votes.items(), key=lambda item: -item[1]):
+        if track_id not in mapping and prev_id not in used:
+            mapping[track_id] = prev_id
+            used.add(prev_id)
+    return mapping
+
+
+def stitch(segments, results, min_iou=CHUNK_MATCH_IOU):
+    """Merge per-segment results into one ResultStore with globally consistent track IDs."""
+    store = ResultStore()
+    weights = TrackWeightAggregator()
+    seen = set()
+    next_id = 1
+    prev_tracks, prev_global = None, {}
+
+    for (read_start, start, _), (frames, tracks) in zip(segments, results):
+        # Local -> global IDs: matched ones inherit the previous segment's global ID, the rest get new ones
+        shared = np.unique(tracks["frame"][tracks["frame"] <= start]) if prev_tracks is not None else []
+        matched = match_tracks(prev_tracks, tracks, shared, min_iou) if len(shared) else {}
+        to_global = {}
+        for track_id in np.unique(tracks["track_id"]).tolist():
+            if track_id in matched:
+                to_global[track_id] = prev_global[matched[track_id]]
+            else:
+                to_global[track_id] = next_id
+                next_id += 1
+        global_ids = np.array([to_global[t] for t in tracks["track_id"].tolist()], dtype=np.int32)
+
+        # Keep only the frames this segment owns (frame numbers are 1-based)
+        owned_frames = frames["frame"] > start
+        owned_tracks = tracks["frame"] > start
+        owned = {name: values[owned_tracks] for name, values in tracks.items()}
+        owned["track_id"] = global_ids[owned_tracks]
+
+        # Recount unique IDs with global IDs: first appearance of each ID, then a running count per frame
+        frame_numbers = frames["frame"][owned_frames]
+        first_seen = {}
+        for frame, track_id in zip(owned["frame"].tolist(), owned["track_id"].tolist()):
+            if track_id not in seen and track_id not in first_seen:
+                first_seen[track_id] = frame
+        new_per_frame = np.searchsorted(np.sort(list(first_seen.values())), frame_numbers, side="right")
+        seen.update(first_seen)
+
+        columns = {name: values[owned_frames] for name, values in frames.items()}
+        columns["total_unique_ids"] = (len(seen) - len(first_seen)) + new_per_frame
+        store.frames.extend(**columns)
+        store.tracks.extend(**owned)
+
+        # Per-track weights from the owned observations, one frame at a time (IDs unique per frame)
+        order = np.argsort(owned["frame"], kind="stable")
+        split_at = np.flatnonzero(np.diff(owned["frame"][order])) + 1
+        for idx in np.split(order, split_at):
+            if len(idx):
+                weights.update(owned["track_id"][idx], owned["w"][idx].astype(np.float64) * owned["h"][idx])
+
+        prev_tracks, prev_global = tracks, to_global
+
+    return store, weights
+
+
+def process_video_chunked(source_video_path, workers=CHUNK_WORKERS, overlap=CHUNK_OVERLAP_FRAMES):
+    """Analyse one long video in parallel segments, one worker process (and model) per segment.
+
+    Analytics only: returns (ResultStore, TrackWeightAggregator) for the whole video,
+    with track IDs reconciled across segment boundaries so total_unique_ids matches
+    a sequential run as closely as the overlap allows.
+    """
+    cap = cv2.VideoCapture(source_video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video: {source_video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    segments = plan_segments(total_frames, workers, overlap)
+    threads = max(1, (os.cpu_count() or 1) // len(segments))
+    with ProcessPoolExecutor(
+        max_workers=len(segments), mp_context=mp.get_context("spawn"),
+        initializer=_init_segment_worker, initargs=(threads,),
+    ) as executor:
+        futures = [executor.submit(_run_segment, source_video_path, read_start, end) for read_start, _, end in segments]
+        results = [future.result() for future in futures]
+
+    return stitch(segments, results)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Analyse a long video in parallel segments")
+    parser.add_argument("video")
+    parser.add_argument("--workers", type=int, default=CHUNK_WORKERS)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP_FRAMES)
+    parser.add_argument("--csv", help="Write the per-frame stats here")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store, weights = process_video_chunked(args.video, args.workers, args.overlap)
+    elapsed = time.perf_counter() - start
+    df = store.to_dataframe()
+    print(f"{len(df)} frames in {elapsed:.1f}s ({len(df) / elapsed:.1f} fps) with {args.workers} workers")
+    print(f"Total unique IDs: {df['total_unique_ids'].iloc[-1] if len(df) else 0}, weight estimates: {len(weights.estimates())}")
+    if args.csv:
+        store.write_csv(args.csv)
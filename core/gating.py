@@ -0,0 +1,62 @@
+import cv2
+from .settings import INFERENCE_STRIDE, MOTION_THRESHOLD, MOTION_MAX_SKIP, MOTION_DOWNSCALE_WIDTH
+
+
+class InferenceGate:
+    """Decides per frame whether to run detection or carry the previous tracks forward.
+
+    A frame is inferred when at least `stride` frames have passed since the last
+    inferred frame and, if motion gating is on, the scene changed enough since then
+    (or `max_skip` frames were carried in a row, so tracks are refreshed regularly).
+    With the defaults (stride 1, no threshold) every frame is inferred.
+    """
+
+    def __init__(self, stride=INFERENCE_STRIDE, motion_threshold=MOTION_THRESHOLD,
+                 max_skip=MOTION_MAX_SKIP, downscale_width=MOTION_DOWNSCALE_WIDTH):
+        self.stride = max(1, int(stride))
+        self.motion_threshold = motion_threshold
+        self.max_skip = max(1, int(max_skip))
+        self.downscale_width = downscale_width
+        self.reference = None  # downscaled gray copy of the last inferred frame
+        self.since_inferred = None
+        self.inferred_frames = 0
+        self.carried_frames = 0
+
+    def motion_score(self, small):
+        # Mean absolute pixel difference (0-255) against the last inferred frame
+        return float(cv2.absdiff(small, self.reference).mean())
+
+    def _downscale(self, frame):
+        h, w = frame.shape[:2]
+        width = min(self.downscale_width, w)
+        small = cv2.resize(frame, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def should_infer(self, frame):
+        infer = self.since_inferred is None or self.since_inferred >= self.stride
+        small = None
+        if infer and self.motion_threshold is not None:
+            small = self._downscale(frame)
+            infer = (
+                self.reference is None
+                or self.since_inferred >= self.max_skip
+                or self.motion_score(small) >= self.motion_threshold
+            )
+
+        if infer:
+            self.reference = small
+            self.since_inferred = 1
+            self.inferred_frames += 1
+        else:
+            self.since_inferred += 1
+            self.carried_frames += 1
+        return infer
+
+    def report(self):
+        total = self.inferred_frames + self.carried_frames
+        return {
+            "total_frames": total,
+            "inferred_frames": self.inferred_frames,
+            "skipped_frames": self.carried_frames,
+            "skip_ratio": self.carried_frames / total if total else 0.0,
+        }
@@ -0,0 +1,336 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .settings import (
+    MAX_CONCURRENT_JOBS, JOB_PROGRESS_INTERVAL, JOB_RETENTION_SECONDS, MAX_FINISHED_JOBS, TRACKS_SAMPLE_SIZE,
+)
+
+# Waiting times of the last jobs kept for /metrics/models
+_WAIT_SAMPLES = 1000
+
+
+# Manager dict (worker pid -> metrics snapshot) shared with the API process, set in every worker
+_metrics_sink = None
+
+
+def _publish_metrics():
+    from .metrics import REGISTRY
+    if _metrics_sink is not None:
+        _metrics_sink[os.getpid()] = REGISTRY.snapshot()
+
+
+def _init_worker(metrics_sink=None):
+    # Load and warm up this worker's models before the first job arrives
+    global _metrics_sink
+    from .model_pool import get_model_pool
+    _metrics_sink = metrics_sink
+    get_model_pool()
+    _publish_metrics()
+
+
+def _worker_stats():
+    from .model_pool import get_model_pool
+    return os.getpid(), get_model_pool().stats()
+
+
+def _run_job(job_id, input_path, output_path, progress, remove_input=False, source_name=None, events=None):
+    # Runs inside a worker process. With `events` (a manager queue) the per-frame records are sent
+    # back as (total_frames, [records]) batches while processing, then None once the job is over.
+    from .metrics import hooks_for
+    from .model_pool import get_model_pool
+    from .pipeline import VideoProcessor
+
+    started_at = time.time()
+    last_update = [0.0]
+
+    def report(frames_done, total_frames):
+        # Progress goes through a manager proxy (one IPC round trip), so throttle it
+        now = time.monotonic()
+        if now - last_update[0] >= JOB_PROGRESS_INTERVAL or frames_done == total_frames:
+            progress[job_id] = (frames_done, total_frames)
+            _publish_metrics()
+            last_update[0] = now
+
+    pool = get_model_pool()
+    wait_start = time.perf_counter()
+    try:
+        with pool.acquire() as model:
+            model_wait = time.perf_counter() - wait_start
+            processor = VideoProcessor(
+                input_path, output_path, progress_callback=report, model=model,
+                profiler=hooks_for("job"), source_name=source_name,
+            )
+            pending, last_flush = [], 0.0
+            for record in processor.iter_frames():
+                if events is None:
+                    continue
+                # One IPC round trip per batch, throttled like the progress updates (the first record goes out at once)
+                pending.append(record)
+                if time.monotonic() - last_flush >= JOB_PROGRESS_INTERVAL:
+                    events.put((processor.total_frames, pending))
+                    pending, last_flush = [], time.monotonic()
+            if pending:
+                events.put((processor.total_frames, pending))
+    finally:
+        # Temp uploads are only needed while decoding, free the disk space right away (also on failure)
+        if remove_input and os.path.exists(input_path):
+            os.remove(input_path)
+        if events is not None:
+            events.put(None)
+        _publish_metrics()
+    store = processor.store
+    progress[job_id] = (len(store.frames), processor.total_frames)
+
+    # CSV + columnar artifacts next to the output video (Parquet skipped without pyarrow)
+    stem = os.path.splitext(output_path)[0]
+    paths = [store.write_csv(f"{stem}.stats.csv"), processor.weights.write_csv(f"{stem}.weights.csv")]
+    try:
+        paths += store.write_parquet(f"{stem}.stats.parquet", f"{stem}.tracks.parquet")
+    except ImportError:
+        pass
+    artifacts = [os.path.basename(p) for p in paths]
+
+    return {
+        # NumPy columns, pickled back to the API process without building per-row dicts
+        "stats": store.frames.columns(),
+        "tracks_sample": store.tracks_sample(TRACKS_SAMPLE_SIZE),
+        "weight_estimates": processor.weights.estimates(),
+        "artifacts": artifacts,
+        "skip_report": processor.skip_report(),
+        "started_at": started_at,
+        "model_wait_seconds": model_wait,
+        "worker": (os.getpid(), pool.stats()),
+    }
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+class JobManager:
+    """Runs video analysis jobs on a process pool and keeps track of their state.
+
+    Jobs go through queued -> running -> completed / failed. At most `max_workers`
+    videos are processed at the same time, the rest wait in the pool's queue.
+    Finished jobs are dropped `retention_seconds` after finishing, or oldest first
+    once more than `max_finished` are kept. A worker dying (e.g. killed for memory)
+    breaks the whole pool: its jobs fail and the pool is replaced by a fresh one.
+    """
+
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS, retention_seconds=JOB_RETENTION_SECONDS, max_finished=MAX_FINISHED_JOBS):
+        # spawn: never fork a process that already has torch / server threads running
+        self.ctx = mp.get_context("spawn")
+        self.max_workers = max_workers
+        self.manager = self.ctx.Manager()
+        self.progress = self.manager.dict()
+        # Latest metrics snapshot of every worker process, merged into /metrics
+        self.metrics = self.manager.dict()
+        self.executor = self._new_executor()
+        self._restart_lock = threading.Lock()
+        self.restarts = 0
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self.finished = OrderedDict()  # job id -> finish time, oldest first
+        # Model pool stats per worker pid, and waiting times of the last jobs
+        self.workers = {}
+        self.jobs_finished = 0
+        self.queue_wait_seconds = deque(maxlen=_WAIT_SAMPLES)
+        self.model_wait_seconds = deque(maxlen=_WAIT_SAMPLES)
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=self.ctx, initializer=_init_worker, initargs=(self.metrics,),
+        )
+
+    def _restart(self, broken):
+        # Replace a broken pool once, however many of its jobs report it
+        with self._restart_lock:
+            if self.executor is not broken:
+                return
+            self.executor = self._new_executor()
+            self.restarts += 1
+            # Dead workers' entries would keep /ready (and /metrics/models) reporting them
+            self.metrics.clear()
+            with self.lock:
+                self.workers.clear()
+            self.warm_up()
+        broken.shutdown(wait=False)
+
+    def warm_up(self):
+        # Start every worker now (each loads its models in the initializer) instead of on the first upload
+        futures = [self.executor.submit(_worker_stats) for _ in range(self.max_workers)]
+        for future in futures:
+            future.add_done_callback(self._record_worker)
+
+    def workers_ready(self):
+        # Workers publish their metrics right after loading their models in the initializer.
+        # An idle worker dying breaks the pool without failing any job, so check here too.
+        executor = self.executor
+        if getattr(executor, "_broken", False):
+            self._restart(executor)
+        return len(self.metrics.keys())
+
+    def _record_worker(self, future):
+        if future.exception() is None:
+            pid, stats = future.result()
+            with self.lock:
+                self.workers[pid] = stats
+
+    def _record_job(self, job_id, submitted_at, executor, future):
+        if isinstance(future.exception(), BrokenProcessPool):
+            self._restart(executor)
+        elif future.exception() is None:
+            result = future.result()
+            pid, stats = result["worker"]
+            with self.lock:
+                self.workers[pid] = stats
+                self.jobs_finished += 1
+                self.queue_wait_seconds.append(result["started_at"] - submitted_at)
+                self.model_wait_seconds.append(result["model_wait_seconds"])
+        self._finish(job_id)
+
+    def _finish(self, job_id):
+        with self.lock:
+            self.finished[job_id] = time.time()
+        self._expire()
+
+    def _expire(self):
+        # Also run from submit() / status(), so old results go even when no new job finishes
+        now = time.time()
+        with self.lock:
+            expired = []
+            while self.finished:
+                oldest, finished_at = next(iter(self.finished.items()))
+                if len(self.finished) <= self.max_finished and now - finished_at < self.retention_seconds:
+                    break
+                self.finished.popitem(last=False)
+                self.jobs.pop(oldest, None)
+                expired.append(oldest)
+        # Manager round trips outside the lock
+        for old_id in expired:
+            self.progress.pop(old_id, None)
+
+    def submit(self, input_path, output_path, remove_input=False, stream=False, **info):
+        # remove_input=True: input_path is a temp file owned by the job, deleted once it is processed
+        # stream=True: the worker sends every frame's record back while processing (see events())
+        job_id = uuid.uuid4().hex
+        submitted_at = time.time()
+        events = self.manager.Queue() if stream else None
+        args = (_run_job, job_id, input_path, output_path, self.progress, remove_input, info.get("filename"), events)
+        executor = self.executor
+        try:
+            future = executor.submit(*args)
+        except BrokenProcessPool:
+            # A worker died since the last job finished: retry once on a fresh pool
+            self._restart(executor)
+            executor = self.executor
+            future = executor.submit(*args)
+        with self.lock:
+            self.jobs[job_id] = {
+                "future": future,
+                "submitted_at": submitted_at,
+                "info": info,
+                "events": events,
+            }
+        future.add_done_callback(lambda f: self._record_job(job_id, submitted_at, executor, f))
+        self._expire()
+        return job_id
+
+    def add_completed(self, result, **info):
+        # Register a job whose result is already known (e.g. served from the result cache)
+        job_id = uuid.uuid4().hex
+        future = Future()
+        future.set_result(result)
+        frames = len(result["stats"]["frame"])
+        self.progress[job_id] = (frames, frames)
+        with self.lock:
+            self.jobs[job_id] = {"future": future, "submitted_at": time.time(), "info": info}
+        self._finish(job_id)
+        return job_id
+
+    def future(self, job_id):
+        job = self.jobs.get(job_id)
+        return job["future"] if job else None
+
+    def events(self, job_id):
+        # Queue of per-frame record batches of a job submitted with stream=True, None otherwise
+        job = self.jobs.get(job_id)
+        return job.get("events") if job else None
+
+    def status(self, job_id):
+        self._expire()
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job["future"]
+        frames_done, total_frames = self.progress.get(job_id, (0, None))
+        if future.done():
+            status = "failed" if future.exception() is not None else "completed"
+        elif job_id in self.progress:
+            status = "running"
+        else:
+            status = "queued"
+
+        state = {
+            "job_id": job_id,
+            "status": status,
+            "progress": {"frames_done": frames_done, "total_frames": total_frames},
+            "submitted_at": job["submitted_at"],
+        }
+        if status == "failed":
+            state["error"] = str(future.exception())
+        state.update(job["info"])
+        return state
+
+    def result(self, job_id):
+        # Only call once status() reports "completed"
+        return self.jobs[job_id]["future"].result()
+
+    def active_jobs(self):
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if not job["future"].done())
+
+    def job_counts(self):
+        # Jobs by status, with a single manager round trip (status() needs one per job)
+        started = set(self.progress.keys())
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        with self.lock:
+            for job_id, job in self.jobs.items():
+                future = job["future"]
+                if future.done():
+                    counts["failed" if future.exception() is not None else "completed"] += 1
+                else:
+                    counts["running" if job_id in started else "queued"] += 1
+        return counts
+
+    def metrics_snapshots(self):
+        return list(self.metrics.values())
+
+    def model_metrics(self):
+        with self.lock:
+            load_seconds = [s for stats in self.workers.values() for s in stats["model_load_seconds"]]
+            return {
+                "workers": len(self.workers),
+                "pool_restarts": self.restarts,
+                "models_loaded": len(load_seconds),
+                "model_load_seconds_max": max(load_seconds, default=0.0),
+                "model_load_seconds_avg": sum(load_seconds) / len(load_seconds) if load_seconds else 0.0,
+                "jobs_finished": self.jobs_finished,
+                # Time a job spent waiting for a free worker, then for a model inside the worker (last jobs)
+                "queue_wait_seconds_max": max(self.queue_wait_seconds, default=0.0),
+                "queue_wait_seconds_avg": _mean(self.queue_wait_seconds),
+                "model_wait_seconds_max": max(self.model_wait_seconds, default=0.0),
+                "model_wait_seconds_avg": _mean(self.model_wait_seconds),
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
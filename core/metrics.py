@@ -0,0 +1,199 @@
+import bisect
+import contextlib
+import threading
+import time
+
+from .profiling import NULL_PROFILER, PipelineHooks
+from .settings import METRICS_ENABLED
+
+# Latency buckets (seconds), from a fast stats update to a slow CPU batch
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, labelnames):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # label values tuple -> value
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        return {"type": self.kind, "help": self.help, "labelnames": self.labelnames, "values": dict(self.values)}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, count=1, **labels):
+        # count > 1 records the same value several times (e.g. per-frame latency of a whole batch)
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            # [per-bucket counts..., +Inf count, sum]
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[idx] += count
+            state[-1] += value * count
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot["buckets"] = self.buckets
+        snapshot["values"] = {key: list(state) for key, state in snapshot["values"].items()}
+        return snapshot
+
+
+class Registry:
+    """A minimal Prometheus-style metrics registry (counters, gauges, histograms).
+
+    Worker processes keep their own registry and ship snapshot() to the API
+    process, which merges the snapshots of all processes and renders them in the
+    Prometheus text format on /metrics.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _get(self, cls, name, help, labelnames, **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(self, name, help, labelnames, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def render(self):
+        return render(self.snapshot())
+
+
+def merge(snapshots):
+    """Sum the snapshots of several processes (counters, histograms and gauges alike)."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "values": {}})
+            for key, value in metric["values"].items():
+                if key not in target["values"]:
+                    target["values"][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target["values"][key] = [a + b for a, b in zip(target["values"][key], value)]
+                else:
+                    target["values"][key] += value
+    return merged
+
+
+def _labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def render(snapshot):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key, value in sorted(metric["values"].items()):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(metric['labelnames'], key)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + ["+Inf"], value[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{name}_bucket{_labels(metric['labelnames'], key, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labelnames'], key)} {value[-1]}")
+            lines.append(f"{name}_count{_labels(metric['labelnames'], key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# This process's metrics
+REGISTRY = Registry()
+
+FRAMES_PROCESSED = REGISTRY.counter(
+    "bird_frames_processed_total", "Frames processed, by source (job, stream or camera id)", ("source",))
+FRAMES_INFERRED = REGISTRY.counter(
+    "bird_frames_inferred_total", "Frames that ran detection (the rest carried the previous tracks)", ("source",))
+STAGE_SECONDS = REGISTRY.histogram(
+    "bird_stage_seconds", "Time per pipeline stage call (detect is per batch, the rest per frame)", ("source", "stage"))
+INFERENCE_SECONDS = REGISTRY.histogram(
+    "bird_inference_seconds_per_frame", "Detection time per frame (batch time / batch size)", ("source",))
+QUEUE_DEPTH = REGISTRY.gauge(
+    "bird_queue_depth", "Frames waiting in a pipeline queue", ("source", "queue"))
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    "bird_model_load_seconds", "Model load + warm-up time", ("backend",),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+
+
+class MetricsHooks(PipelineHooks):
+    """Pipeline hooks that feed REGISTRY, labelled with the source being processed."""
+
+    def __init__(self, source):
+        self.source = source
+
+    @contextlib.contextmanager
+    def stage(self, name, frames=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_SECONDS.observe(elapsed, source=self.source, stage=name)
+            if name == "detect":
+                INFERENCE_SECONDS.observe(elapsed / frames, count=frames, source=self.source)
+
+    def frame_done(self, record):
+        FRAMES_PROCESSED.inc(source=self.source)
+        if record["inferred"]:
+            FRAMES_INFERRED.inc(source=self.source)
+
+    def queue_depth(self, name, depth):
+        QUEUE_DEPTH.set(depth, source=self.source, queue=name)
+
+
+def hooks_for(source):
+    """MetricsHooks for `source`, or the no-op hooks when METRICS_ENABLED is off."""
+    return MetricsHooks(source) if METRICS_ENABLED else NULL_PROFILER
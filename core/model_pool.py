@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from .backends import load_model
+from .metrics import MODEL_LOAD_SECONDS
+from .settings import INFERENCE_BACKEND, MODEL_POOL_SIZE
+
+
+class ModelPool:
+    """A fixed number of loaded, warmed-up YOLO models shared by the jobs of one process.
+
+    Jobs borrow a model with `acquire()` and give it back when done, so weights are
+    loaded and fused once per instance instead of once per request. The models hold
+    no tracker state (tracking lives in FrameTracker), so nothing carries over from
+    one job to the next.
+    """
+
+    def __init__(self, size=MODEL_POOL_SIZE, backend=INFERENCE_BACKEND):
+        self.size = max(1, int(size))
+        self.backend = backend
+        self.available = queue.Queue()
+        self.lock = threading.Lock()
+        self.load_seconds = []
+        self.acquisitions = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def load(self, warm_up=True):
+        from .pipeline import detect
+
+        for _ in range(self.size):
+            start = time.perf_counter()
+            model = load_model(self.backend)
+            if warm_up:
+                # First inference fuses the model and sets up the predictor
+                detect(model, [np.zeros((640, 640, 3), dtype=np.uint8)])
+            self.load_seconds.append(time.perf_counter() - start)
+            MODEL_LOAD_SECONDS.observe(self.load_seconds[-1], backend=self.backend)
+            self.available.put(model)
+        return self
+
+    @contextmanager
+    def acquire(self):
+        start = time.perf_counter()
+        model = self.available.get()
+        waited = time.perf_counter() - start
+        with self.lock:
+            self.acquisitions += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        try:
+            yield model
+        finally:
+            self.available.put(model)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "available": self.available.qsize(),
+                "backend": self.backend,
+                "model_load_seconds": list(self.load_seconds),
+                "acquisitions": self.acquisitions,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool():
+    """The process-wide pool, loaded (and warmed up) on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ModelPool().load()
+    return _pool
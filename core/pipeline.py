@@ -1,119 +1,340 @@
-import cv2
-import pandas as pd
-import numpy as np
-from ultralytics import YOLO
-from collections import defaultdict
-from .settings import MODEL_PATH, CONFIDENCE_THRESHOLD, IOU_THRESHOLD, TARGET_CLASS_IDS, TRACKER_CONFIG
+import os
+import queue
+import threading
+from . import settings
+from .settings import (
+    CONFIDENCE_THRESHOLD, IOU_THRESHOLD,
+    PIPELINED_PROCESSING, PIPELINE_QUEUE_SIZE, BATCH_SIZE, ANNOTATE_VIDEO, ANNOTATION_LABELS, TILE_BATCH_SIZE,
+)
+from .backends import load_model
+from .annotate import draw_annotations, frame_summary, weight_proxies
+from .tracking import FrameTracker, tracked_boxes
+from .gating import InferenceGate
+from .profiling import NULL_PROFILER
+from .regions import region_for
+from .results_store import ResultStore
+from .video_io import open_reader, open_writer
+from .weights import TrackWeightAggregator
+
+# Marks the end of the stream in a stage queue
+_END = object()
+
+# Upper bound on frames buffered while waiting for a full detection batch
+# (long static stretches produce many carried frames between inferred ones)
+_MAX_PENDING_FRAMES = 64
+
+
+def _put(q, item, stop):
+    # Blocking put that gives up once another stage has failed (backpressure without deadlock)
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+class _FramePool:
+    # Decoded frames are recycled once annotated/encoded: cap.read(buffer) decodes straight into
+    # an existing array instead of allocating (and page-faulting) a new full frame every time.
+    def __init__(self, capacity):
+        self.free = queue.Queue(maxsize=capacity)
+
+    def acquire(self):
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            return None  # nothing to recycle yet, cap.read allocates
+
+    def release(self, frame):
+        try:
+            self.free.put_nowait(frame)
+        except queue.Full:
+            pass
+
+
+def _read_frames(cap, start_frame=0, end_frame=None, pool=None, profiler=NULL_PROFILER):
+    # Yields (1-based frame number, frame) from start_frame up to end_frame (exclusive, 0-based)
+    frame_idx = start_frame
+    while end_frame is None or frame_idx < end_frame:
+        with profiler.stage("decode"):
+            success, frame = cap.read(pool.acquire() if pool is not None else None)
+        if not success:
+            return
+        frame_idx += 1
+        yield frame_idx, frame
+
+
+def _drain(q, stop):
+    while True:
+        item = _get(q, stop)
+        if item is _END:
+            return
+        yield item
+
+
+def detect(model, frames, regions=None):
+    """Run one batched YOLO forward pass over a list of frames (no tracking).
+
+    `regions` gives every frame its core.regions.RegionDetector (None: whole frame).
+    The ROI crops / tiles of all frames then go through the model together, in
+    batches of TILE_BATCH_SIZE, and come back as one Results per frame.
+    """
+    if regions is None or not any(regions):
+        return _predict(model, frames)
+
+    views, spans = [], []
+    for frame, region in zip(frames, regions):
+        frame_views = region.views(frame) if region is not None else [(frame, (0, 0))]
+        spans.append((len(views), len(frame_views)))
+        views.extend(frame_views)
+    raw = []
+    for i in range(0, len(views), TILE_BATCH_SIZE):
+        raw.extend(_predict(model, [image for image, _ in views[i:i + TILE_BATCH_SIZE]]))
+
+    results = []
+    for frame, region, (start, n) in zip(frames, regions, spans):
+        if region is None:
+            results.append(raw[start])
+        else:
+            results.append(region.merge(frame, raw[start:start + n], [offset for _, offset in views[start:start + n]]))
+    return results
+
+
+def _predict(model, frames):
+    # We need to ensure we catch birds.
+    # Since we might not have a trained model for 'chicken', we rely on 'bird' class (14) or just all detections if likely only chickens.
+    # But let's assume class 14 for now. PROTOTYPE HACK: If detection is poor, we might need to allow all classes.
+    return model.predict(
+        frames,
+        conf=CONFIDENCE_THRESHOLD,
+        iou=IOU_THRESHOLD,
+        classes=settings.TARGET_CLASS_IDS,  # resolved with the model path on first use
+        verbose=False
+    )
+
 
 class VideoProcessor:
-    def __init__(self, source_video_path, output_video_path):
+    def __init__(self, source_video_path, output_video_path, pipelined=PIPELINED_PROCESSING, queue_size=PIPELINE_QUEUE_SIZE, batch_size=BATCH_SIZE, progress_callback=None, model=None, annotate=ANNOTATE_VIDEO, keep_results=True, start_frame=0, end_frame=None, profiler=None, source_name=None):
         self.source_video_path = source_video_path
         self.output_video_path = output_video_path
-        self.model = YOLO(MODEL_PATH) 
-        self.track_history = defaultdict(lambda: [])
+        # A model borrowed from a ModelPool can be passed in, otherwise load our own
+        self.model = model if model is not None else load_model()
+        # Fresh tracker per processor, tracks never leak between videos sharing a model
+        # Detection runs on `batch_size` frames at once, the tracker is then updated frame by frame
+        self.tracker = FrameTracker()
+        self.batch_size = max(1, int(batch_size))
+        # Skips detection on static frames / off-stride frames, their tracks are carried forward
+        self.gate = InferenceGate()
+        self.last_result = None
         self.unique_ids = set()
-        self.frame_data = [] # To store count and weights per frame
+        # Per-frame stats and per-track box histories (None when only streaming records out)
+        self.store = ResultStore() if keep_results else None
+        # Per-track weight estimates, constant memory per bird
+        self.weights = TrackWeightAggregator()
+        # Pipelined mode runs decode, tracking and annotation/encoding on separate threads
+        self.pipelined = pipelined
+        self.queue_size = queue_size
+        # Called as progress_callback(frames_done, total_frames) after every frame
+        self.progress_callback = progress_callback
+        self.total_frames = 0
+        # annotate=False: analytics only, no drawing and no output video
+        self.annotate = annotate
+        self.labels = ANNOTATION_LABELS
+        # Only process frames [start_frame, end_frame) (0-based), e.g. one segment of a long video
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        # Enough recycled buffers for every frame that can be in flight between decode and encode
+        self.frame_pool = _FramePool(2 * queue_size + self.batch_size + 2)
+        # Instrumentation hooks (core.profiling.PipelineHooks): a StageProfiler for benchmarks,
+        # core.metrics.MetricsHooks in the service, no-ops otherwise
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        # ROI crop / tiled detection (core.regions), looked up by source_name (the original upload name)
+        self.region = region_for(source_name or os.path.basename(source_video_path))
 
     def process_video(self):
-        cap = cv2.VideoCapture(self.source_video_path)
-        if not cap.isOpened():
-            raise Exception(f"Could not open video: {self.source_video_path}")
-
-        # Video properties
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-        # Output video writer
-        out = cv2.VideoWriter(self.output_video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
-
-        frame_idx = 0
-        
-        # We need to ensure we catch birds. 
-        # Since we might not have a trained model for 'chicken', we rely on 'bird' class (14) or just all detections if likely only chickens.
-        # But let's assume class 14 for now. PROTOTYPE HACK: If detection is poor, we might need to allow all classes.
-        classes_to_track = TARGET_CLASS_IDS
-        
-        # Iterate
-        while True:
-            success, frame = cap.read()
-            if not success:
-                break
-            
-            frame_idx += 1
-            
-            # Run YOLOv8 tracking
-            # defined via settings
-            results = self.model.track(
-                frame, 
-                persist=True, 
-                conf=CONFIDENCE_THRESHOLD, 
-                iou=IOU_THRESHOLD,
-                tracker=TRACKER_CONFIG,
-                classes=classes_to_track,
-                verbose=False
-            )
-            
-            current_frame_weights = []
-            current_frame_count = 0
-            
-            # Process results
-            if results[0].boxes.id is not None:
-                boxes = results[0].boxes.xywh.cpu()
-                track_ids = results[0].boxes.id.int().cpu().tolist()
-                
-                # Visualize
-                annotated_frame = results[0].plot()
-                
-                for box, track_id in zip(boxes, track_ids):
-                    x, y, w, h = box
-                    
-                    # Weight Proxy
-                    weight_proxy = float(w * h)
-                    current_frame_weights.append(weight_proxy)
-                    
-                    # Track logic
-                    self.unique_ids.add(track_id)
-                    
-                    # Custom Annotation (Overlay Weight on BBox)
-                    # YOLO plot() handles basic ID, but we want to add Weight text
-                    # We can draw over the annotated frame
-                    # Convert xywh center to top-left for putting text
-                    x1 = int(x - w/2)
-                    y1 = int(y - h/2)
-                    cv2.putText(
-                        annotated_frame, 
-                        f"W:{weight_proxy:.0f}", 
-                        (x1, y1 - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 
-                        0.5, 
-                        (0, 255, 0), 
-                        2
-                    )
+        if self.store is None:
+            raise ValueError("process_video() needs keep_results=True, use iter_frames() to stream the records")
+        for _ in self.iter_frames():
+            pass
+        return self.store.to_dataframe()
+
+    def iter_frames(self):
+        """Process the video, yielding each frame's stats record as soon as it is known.
+
+        With keep_results=False nothing is stored, so long videos can be consumed
+        as a stream with constant memory.
+        """
+        # Reader / writer per VIDEO_READER / VIDEO_WRITER (core.video_io)
+        cap = open_reader(self.source_video_path, self.start_frame)
+        fps = cap.fps
+        self.total_frames = cap.frame_count
 
+        out = None
+        try:
+            # Output video writer (None for stats-only runs, also with VIDEO_WRITER = "none")
+            if self.annotate:
+                out = open_writer(self.output_video_path, fps, (cap.width, cap.height))
+            if self.pipelined:
+                yield from self._run_pipelined(cap, out, fps)
             else:
-                annotated_frame = frame
-                
-            current_frame_count = len(current_frame_weights)
-            avg_weight = np.mean(current_frame_weights) if current_frame_weights else 0
-            
-            # Store data
-            self.frame_data.append({
-                "frame": frame_idx,
-                "timestamp": frame_idx / fps,
-                "bird_count": current_frame_count,
-                "avg_weight_proxy": avg_weight,
-                "total_unique_ids": len(self.unique_ids)
-            })
-            
-            # Overlay Global Stats
-            cv2.putText(annotated_frame, f"Count: {current_frame_count}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            cv2.putText(annotated_frame, f"Total IDs: {len(self.unique_ids)}", (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            out.write(annotated_frame)
-
-        cap.release()
-        out.release()
-        
-        return pd.DataFrame(self.frame_data)
+                yield from self._run_serial(cap, out, fps)
+        finally:
+            cap.release()
+            if out is not None:
+                out.release()
+
+    def _run_serial(self, cap, out, fps):
+        for frame_idx, frame, result, inferred in self._tracked(_read_frames(cap, self.start_frame, self.end_frame, self.frame_pool, self.profiler)):
+            tracks, record = self._update_stats(frame_idx, fps, result, inferred)
+            # Frames dropped by OUTPUT_FPS are neither annotated nor encoded
+            if out is not None and out.wants(frame_idx):
+                self._write(out, frame, tracks, record)
+            self.frame_pool.release(frame)
+            yield record
+
+    def _run_pipelined(self, cap, out, fps):
+        # Decode -> track -> annotate/encode, connected by bounded queues.
+        # Tracking stays on the calling thread, so frames reach the tracker in order
+        # and the tracker state is exactly the same as in serial mode.
+        decoded = queue.Queue(maxsize=self.queue_size)
+        tracked = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors = []
+
+        def decode():
+            for item in _read_frames(cap, self.start_frame, self.end_frame, self.frame_pool, self.profiler):
+                if not _put(decoded, item, stop):
+                    return
+            _put(decoded, _END, stop)
+
+        def encode():
+            while True:
+                item = _get(tracked, stop)
+                if item is _END:
+                    return
+                self._write(out, *item)
+                self.frame_pool.release(item[0])
+
+        def guarded(fn):
+            def run():
+                try:
+                    fn()
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+            return run
+
+        workers = [threading.Thread(target=guarded(decode), name="decode", daemon=True)]
+        if out is not None:
+            workers.append(threading.Thread(target=guarded(encode), name="encode", daemon=True))
+        for worker in workers:
+            worker.start()
+
+        try:
+            for frame_idx, frame, result, inferred in self._tracked(_drain(decoded, stop)):
+                tracks, record = self._update_stats(frame_idx, fps, result, inferred)
+                self.profiler.queue_depth("decoded", decoded.qsize())
+                self.profiler.queue_depth("tracked", tracked.qsize())
+                if out is None or not out.wants(frame_idx):
+                    self.frame_pool.release(frame)
+                elif not _put(tracked, (frame, tracks, record), stop):
+                    break
+                yield record
+            if out is not None:
+                _put(tracked, _END, stop)
+        except BaseException:
+            # Also covers the consumer closing the generator early
+            stop.set()
+            raise
+        finally:
+            for worker in workers:
+                worker.join()
+
+        if errors:
+            raise errors[0]
+
+    def skip_report(self):
+        return self.gate.report()
+
+    def _tracked(self, frames):
+        # Group the frames that need detection into batches, then feed the tracker in frame order.
+        # Frames the gate skips ride along and reuse the latest tracked result.
+        pending = []
+        n_infer = 0
+        for frame_idx, frame in frames:
+            with self.profiler.stage("gate"):
+                # Motion outside the ROI (people in the aisle) does not trigger detection
+                inferred = self.gate.should_infer(self.region.crop(frame) if self.region is not None else frame)
+            pending.append((frame_idx, frame, inferred))
+            n_infer += inferred
+            if n_infer == self.batch_size or len(pending) >= _MAX_PENDING_FRAMES:
+                yield from self._track_batch(pending)
+                pending = []
+                n_infer = 0
+        if pending:
+            yield from self._track_batch(pending)
+
+    def _track_batch(self, pending):
+        to_infer = [frame for _, frame, inferred in pending if inferred]
+        results = iter([])
+        if to_infer:
+            with self.profiler.stage("detect", frames=len(to_infer)):
+                results = iter(detect(self.model, to_infer, [self.region] * len(to_infer)))
+        for frame_idx, frame, inferred in pending:
+            if inferred:
+                with self.profiler.stage("track"):
+                    self.last_result = self.tracker.update(next(results))
+            yield frame_idx, frame, self.last_result, inferred
+
+    def _update_stats(self, frame_idx, fps, result, inferred=True):
+        with self.profiler.stage("stats"):
+            return self._frame_stats(frame_idx, fps, result, inferred)
+
+    def _frame_stats(self, frame_idx, fps, result, inferred):
+        # Weight proxies and counts for all boxes at once
+        xywh, track_ids = tracked_boxes(result)
+        weights = weight_proxies(xywh)
+        current_frame_count, avg_weight = frame_summary(weights)
+
+        # Track logic (carried frames cannot introduce new IDs or new weight observations)
+        if inferred:
+            self.unique_ids.update(track_ids.tolist())
+            self.weights.update(track_ids, weights)
+
+        record = {
+            "frame": frame_idx,
+            "timestamp": frame_idx / fps,
+            "bird_count": current_frame_count,
+            "avg_weight_proxy": avg_weight,
+            "total_unique_ids": len(self.unique_ids),
+            "inferred": inferred  # False when the tracks were carried over from an earlier frame
+        }
+        if self.store is not None:
+            self.store.add_frame(record, xywh, track_ids)
+        self.profiler.frame_done(record)
+        if self.progress_callback is not None:
+            self.progress_callback(frame_idx, self.total_frames)
+        return (xywh, track_ids, weights), record
+
+    def _write(self, out, frame, tracks, record):
+        with self.profiler.stage("annotate"):
+            annotated = self._annotate(frame, tracks, record)
+        with self.profiler.stage("encode"):
+            out.write(annotated)
+
+    def _annotate(self, frame, tracks, record):
+        # Drawn straight onto the decoded frame, no copy (the buffer is recycled after encoding)
+        # (stats come from the frame's record, the running totals may already be ahead in pipelined mode)
+        xywh, track_ids, weights = tracks
+        return draw_annotations(frame, xywh, track_ids, weights, record["bird_count"], record["total_unique_ids"], labels=self.labels)
@@ -0,0 +1,79 @@
+import contextlib
+import sys
+import time
+
+import numpy as np
+
+
+class PipelineHooks:
+    """Instrumentation interface of VideoProcessor (`profiler=`), every hook a no-op here.
+
+    stage(name, frames) wraps one stage call: decode, gate, detect (per batch of
+    `frames`), track, stats, annotate and encode. frame_done(record) runs once per
+    frame and queue_depth(name, depth) once per frame and pipeline queue in
+    pipelined mode. Subclasses override what they need.
+    """
+
+    _noop = contextlib.nullcontext()
+
+    def stage(self, name, frames=1):
+        return self._noop
+
+    def frame_done(self, record):
+        pass
+
+    def queue_depth(self, name, depth):
+        pass
+
+    def summary(self):
+        return {}
+
+
+# Default hooks: a shared no-op context per stage, so an uninstrumented run pays almost nothing
+NULL_PROFILER = PipelineHooks()
+
+
+class StageProfiler(PipelineHooks):
+    """Wall-clock time of every pipeline stage call, summarized as latency percentiles.
+
+    Stages running on different threads in pipelined mode overlap, so their
+    totals can add up to more than the run time.
+    """
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, frames=1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+    def summary(self):
+        summary = {}
+        for name, samples in self.samples.items():
+            ms = np.asarray(samples) * 1000
+            summary[name] = {
+                "calls": len(ms),
+                "total_s": round(float(ms.sum()) / 1000, 4),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p90_ms": round(float(np.percentile(ms, 90)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+        return summary
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far (psutil on Windows)."""
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
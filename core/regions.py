@@ -0,0 +1,148 @@
+import fnmatch
+
+import cv2
+import numpy as np
+from .settings import (
+    ROI_POLYGONS, TILE_SIZE, TILE_OVERLAP, TILE_FULL_FRAME, TILE_MERGE_THRESHOLD,
+)
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """(x0, y0, x1, y1) tiles of at most tile_size covering a width x height image.
+
+    Neighbouring tiles overlap by `overlap` (fraction of the tile); the last tile
+    of every row / column is shifted back so it ends exactly on the border.
+    """
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, step)) + [length - tile_size]
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+
+def merge_detections(data, threshold=TILE_MERGE_THRESHOLD):
+    """Greedy merge of (N, 6) x1, y1, x2, y2, conf, cls detections from overlapping views.
+
+    A bird cut by a tile seam shows up as a partial box inside the tile and a
+    full box in the neighbour (or the full-frame pass), so boxes are compared by
+    intersection over the *smaller* box rather than IoU. Boxes of the same class
+    overlapping the most confident remaining box by at least `threshold` are
+    folded into it: the merged box spans all of them and keeps the highest
+    confidence.
+    """
+    if len(data) < 2:
+        return data
+    data = data[np.argsort(-data[:, 4], kind="stable")]
+    area = np.prod(data[:, 2:4] - data[:, :2], axis=1)
+    alive = np.ones(len(data), dtype=bool)
+    merged = []
+    for i in range(len(data)):
+        if not alive[i]:
+            continue
+        box = data[i].copy()
+        rest = np.flatnonzero(alive & (data[:, 5] == box[5]))
+        wh = np.clip(np.minimum(box[2:4], data[rest, 2:4]) - np.maximum(box[:2], data[rest, :2]), 0, None)
+        ios = wh.prod(axis=1) / np.maximum(np.minimum(area[i], area[rest]), 1e-9)
+        group = rest[ios >= threshold]
+        box[:2] = data[group, :2].min(axis=0)
+        box[2:4] = data[group, 2:4].max(axis=0)
+        alive[group] = False
+        merged.append(box)
+    return np.stack(merged)
+
+
+class RegionDetector:
+    """Restricts detection of one source to its region of interest, optionally tiled.
+
+    views(frame) turns a frame into the images to run the detector on: the ROI's
+    bounding box with everything outside the ROI polygons blacked out, and with
+    tiling enabled one image per tile (plus the whole ROI, downscaled by YOLO as
+    usual, so birds larger than a tile are still found). merge() maps the boxes of
+    all views back to full-frame coordinates and merges duplicates across tile
+    seams, giving one Results per frame for the tracker.
+    """
+
+    def __init__(self, polygons=None, tile_size=TILE_SIZE, overlap=TILE_OVERLAP,
+                 full_frame=TILE_FULL_FRAME, merge_threshold=TILE_MERGE_THRESHOLD):
+        self.polygons = [np.asarray(polygon, dtype=np.int32) for polygon in polygons or []]
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.merge_threshold = merge_threshold
+        self._shape = None  # frame shape the mask / bounds / tiles below were computed for
+
+    def _prepare(self, shape):
+        height, width = shape[:2]
+        self._shape = shape
+        self.mask = None
+        self.bounds = (0, 0, width, height)
+        if self.polygons:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, self.polygons, 255)
+            x, y, w, h = cv2.boundingRect(mask)
+            self.bounds = (x, y, x + w, y + h)
+            crop_mask = mask[y:y + h, x:x + w] > 0
+            # Rectangular ROIs need no masking, cropping is enough
+            self.mask = None if crop_mask.all() else crop_mask
+        x0, y0, x1, y1 = self.bounds
+        self.tiles = tile_grid(x1 - x0, y1 - y0, self.tile_size, self.overlap) if self.tile_size else []
+
+    def crop(self, frame):
+        """View (no copy) of the ROI's bounding box, e.g. for motion gating."""
+        if frame.shape != self._shape:
+            self._prepare(frame.shape)
+        x0, y0, x1, y1 = self.bounds
+        return frame[y0:y1, x0:x1]
+
+    def views(self, frame):
+        """[(image, (x offset, y offset)), ...] to run the detector on for this frame."""
+        crop = self.crop(frame)
+        if self.mask is not None:
+            # Copy, the original frame is still annotated and encoded afterwards
+            crop = np.where(self.mask[..., None], crop, 0).astype(crop.dtype, copy=False)
+        x0, y0 = self.bounds[:2]
+        if len(self.tiles) <= 1:
+            return [(crop, (x0, y0))]
+        views = [(crop[ty0:ty1, tx0:tx1], (x0 + tx0, y0 + ty0)) for tx0, ty0, tx1, ty1 in self.tiles]
+        if self.full_frame:
+            views.append((crop, (x0, y0)))
+        return views
+
+    def merge(self, frame, results, offsets):
+        """One Results in full-frame coordinates from the results of this frame's views."""
+        import torch
+        from ultralytics.engine.results import Results
+
+        parts = []
+        for result, (dx, dy) in zip(results, offsets):
+            data = result.boxes.data.cpu().numpy()[:, :6].copy()
+            data[:, [0, 2]] += dx
+            data[:, [1, 3]] += dy
+            parts.append(data)
+        data = np.concatenate(parts) if parts else np.zeros((0, 6), dtype=np.float32)
+        if len(results) > 1:
+            data = merge_detections(data, self.merge_threshold)
+        return Results(frame, path=results[0].path, names=results[0].names, boxes=torch.as_tensor(data, dtype=torch.float32))
+
+
+def roi_for(source, rois=ROI_POLYGONS):
+    """ROI polygons of a source (video filename, stream id or camera id), None when no pattern matches.
+
+    ROI_POLYGONS keys are fnmatch patterns tried in order, "*" matches every source.
+    """
+    polygons = next((polygons for pattern, polygons in rois.items() if fnmatch.fnmatch(str(source), pattern)), None)
+    return polygons or None
+
+
+def region_for(source, rois=ROI_POLYGONS, tile_size=TILE_SIZE):
+    """RegionDetector for a source, None to detect on the whole frame (no ROI and no tiling)."""
+    polygons = roi_for(source, rois)
+    if not polygons and not tile_size:
+        return None
+    return RegionDetector(polygons, tile_size)
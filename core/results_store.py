@@ -0,0 +1,138 @@
+import numpy as np
+from .settings import RESULT_CHUNK_SIZE
+
+# Per-frame stats (one row per frame)
+FRAME_COLUMNS = {
+    "frame": np.int32,
+    "timestamp": np.float64,
+    "bird_count": np.int32,
+    "avg_weight_proxy": np.float32,
+    "total_unique_ids": np.int32,
+    "inferred": np.bool_,
+}
+
+# Per-track box history (one row per tracked box per frame)
+TRACK_COLUMNS = {
+    "frame": np.int32,
+    "track_id": np.int32,
+    "x": np.float32,
+    "y": np.float32,
+    "w": np.float32,
+    "h": np.float32,
+}
+
+
+class ChunkedColumns:
+    """Append-only numeric columns stored in preallocated fixed-size NumPy chunks.
+
+    Appending never copies existing data (a full chunk is simply kept and a new
+    one allocated), and memory is a few bytes per value instead of a Python
+    object per row.
+    """
+
+    def __init__(self, dtypes, chunk_size=RESULT_CHUNK_SIZE):
+        self.dtypes = dtypes
+        self.chunk_size = chunk_size
+        self.chunks = []  # full chunks: {name: ndarray}
+        self.current = self._new_chunk()
+        self.fill = 0
+
+    def _new_chunk(self):
+        return {name: np.empty(self.chunk_size, dtype=dtype) for name, dtype in self.dtypes.items()}
+
+    def __len__(self):
+        return len(self.chunks) * self.chunk_size + self.fill
+
+    def append(self, **row):
+        for name, value in row.items():
+            self.current[name][self.fill] = value
+        self.fill += 1
+        if self.fill == self.chunk_size:
+            self.chunks.append(self.current)
+            self.current = self._new_chunk()
+            self.fill = 0
+
+    def extend(self, **columns):
+        # Append many rows given as equally long arrays (e.g. all boxes of one frame)
+        n = len(next(iter(columns.values())))
+        start = 0
+        while start < n:
+            take = min(n - start, self.chunk_size - self.fill)
+            for name, values in columns.items():
+                self.current[name][self.fill:self.fill + take] = values[start:start + take]
+            self.fill += take
+            start += take
+            if self.fill == self.chunk_size:
+                self.chunks.append(self.current)
+                self.current = self._new_chunk()
+                self.fill = 0
+
+    def column(self, name):
+        parts = [chunk[name] for chunk in self.chunks] + [self.current[name][:self.fill]]
+        return np.concatenate(parts)
+
+    def columns(self):
+        return {name: self.column(name) for name in self.dtypes}
+
+
+class ResultStore:
+    """Array-backed results of one video: per-frame stats and per-track box histories."""
+
+    def __init__(self, chunk_size=RESULT_CHUNK_SIZE):
+        self.frames = ChunkedColumns(FRAME_COLUMNS, chunk_size)
+        self.tracks = ChunkedColumns(TRACK_COLUMNS, chunk_size)
+
+    def add_frame(self, record, xywh, track_ids):
+        self.frames.append(**{name: record[name] for name in FRAME_COLUMNS})
+        # Carried frames repeat the previous boxes, only real observations go into the history
+        if record["inferred"] and len(track_ids):
+            self.tracks.extend(
+                frame=np.full(len(track_ids), record["frame"]),
+                track_id=track_ids,
+                x=xywh[:, 0], y=xywh[:, 1], w=xywh[:, 2], h=xywh[:, 3],
+            )
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(self.frames.columns())
+
+    def track_history(self, track_id):
+        tracks = self.tracks.columns()
+        mask = tracks["track_id"] == track_id
+        return {name: values[mask] for name, values in tracks.items()}
+
+    def tracks_sample(self, limit=None):
+        # Median box of every track (or the first `limit` tracks) as xmin/ymin/xmax/ymax
+        tracks = self.tracks.columns()
+        if not len(tracks["track_id"]):
+            return []
+        order = np.argsort(tracks["track_id"], kind="stable")
+        ids, starts = np.unique(tracks["track_id"][order], return_index=True)
+        boxes = np.stack([tracks[name][order] for name in ("x", "y", "w", "h")], axis=1)
+        groups = np.split(boxes, starts[1:])[:limit]
+
+        sample = []
+        for track_id, group in zip(ids.tolist(), groups):
+            x, y, w, h = np.median(group, axis=0).tolist()
+            sample.append({
+                "track_id": track_id,
+                "representative_box": {
+                    "xmin": round(x - w / 2), "ymin": round(y - h / 2),
+                    "xmax": round(x + w / 2), "ymax": round(y + h / 2),
+                },
+                "observations": len(group),
+            })
+        return sample
+
+    def write_csv(self, path):
+        self.to_dataframe().to_csv(path, index=False)
+        return path
+
+    def write_parquet(self, frames_path, tracks_path):
+        # Needs pyarrow (optional dependency)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.table(self.frames.columns()), frames_path)
+        pq.write_table(pa.table(self.tracks.columns()), tracks_path)
+        return frames_path, tracks_path
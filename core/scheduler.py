@@ -0,0 +1,188 @@
+import threading
+import time
+
+from .backends import load_model
+from .metrics import hooks_for
+from .pipeline import detect
+from .regions import region_for
+from .settings import SCHEDULER_BATCH_SIZE, CAMERA_TARGET_FPS
+from .stream import RollingWindowStats, open_stream
+from .annotate import weight_proxies
+from .tracking import FrameTracker, tracked_boxes
+
+
+class CameraFeed:
+    """One camera of the scheduler: its stream source, its own tracker and rolling stats."""
+
+    def __init__(self, camera_id, url, target_fps=CAMERA_TARGET_FPS):
+        self.camera_id = camera_id
+        self.url = url
+        self.target_fps = target_fps
+        self.source = open_stream(url)
+        self.tracker = FrameTracker()
+        self.window = RollingWindowStats()
+        # Per-camera frames / tracking time, for throughput alerts per camera
+        self.hooks = hooks_for(camera_id)
+        # Cameras keep their own ROI / tiling, their crops still share the batched forward passes
+        self.region = region_for(camera_id)
+        self.next_due = 0.0
+        self.last_served = 0.0
+        self.frames_processed = 0
+        self.lag_seconds = 0.0
+        self.started_at = time.monotonic()
+        self.error = None  # last tracking error of this camera
+        self._recent = []  # processing times of the last frames, for achieved fps
+        # The scheduler thread records while /cameras and /metrics read the stats
+        self._lock = threading.Lock()
+
+    def record(self, captured_at, result):
+        xywh, track_ids = tracked_boxes(result)
+        with self._lock:
+            self.window.add(captured_at, track_ids.tolist(), weight_proxies(xywh))
+            self.frames_processed += 1
+            self.lag_seconds = time.time() - captured_at
+            self._recent.append(time.monotonic())
+            del self._recent[:-30]
+        self.hooks.frame_done({"inferred": True})
+
+    def achieved_fps(self):
+        if len(self._recent) < 2:
+            return 0.0
+        return (len(self._recent) - 1) / max(self._recent[-1] - self._recent[0], 1e-6)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "camera_id": self.camera_id,
+                "target_fps": self.target_fps,
+                "achieved_fps": self.achieved_fps(),
+                "frames_processed": self.frames_processed,
+                "lag_seconds": self.lag_seconds,
+                "error": self.error,
+                "source": self.source.stats(),
+                "window": self.window.summary(),
+            }
+
+
+class MultiCameraScheduler:
+    """Counts birds on many cameras with one shared model.
+
+    Each camera keeps its own tracker, but frames from all cameras are interleaved
+    into shared batched forward passes. Cameras that are due (per their target fps)
+    are served least-recently-served first, so a busy node degrades every camera's
+    frame rate evenly instead of starving some of them. Frames a camera produces
+    while waiting are dropped by its StreamSource, which keeps the lag bounded.
+    """
+
+    def __init__(self, model=None, batch_size=SCHEDULER_BATCH_SIZE):
+        self.model = model if model is not None else load_model()
+        self.batch_size = max(1, int(batch_size))
+        self.feeds = {}
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.frames_processed = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        # Failed shared batches (their frames are dropped, the next batch is tried as usual)
+        self.failed_batches = 0
+        self.error = None
+        # Shared batches are timed under source="scheduler", tracking per camera
+        self.hooks = hooks_for("scheduler")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_camera(self, camera_id, url, target_fps=CAMERA_TARGET_FPS):
+        feed = CameraFeed(camera_id, url, target_fps)
+        with self.lock:
+            if camera_id in self.feeds:
+                raise ValueError(f"Camera already registered: {camera_id}")
+            self.feeds[camera_id] = feed
+        feed.source.start()
+        return feed
+
+    def remove_camera(self, camera_id):
+        with self.lock:
+            feed = self.feeds.pop(camera_id)
+        feed.source.stop()
+        return feed
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="camera-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self.lock:
+            feeds = list(self.feeds.values())
+        for feed in feeds:
+            feed.source.stop()
+
+    def _collect(self):
+        # Up to batch_size frames, one per due camera, least recently served first
+        now = time.monotonic()
+        with self.lock:
+            due = [feed for feed in self.feeds.values() if now >= feed.next_due]
+        due.sort(key=lambda feed: feed.last_served)
+
+        batch = []
+        for feed in due:
+            item = feed.source.read(timeout=0)
+            if item is None:
+                continue
+            if feed.target_fps:
+                # Keep the schedule anchored, but never let a slow camera build up a backlog
+                period = 1.0 / feed.target_fps
+                feed.next_due = max(feed.next_due, now - period) + period
+            feed.last_served = now
+            batch.append((feed, item[1], item[2]))
+            if len(batch) == self.batch_size:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                self._stop.wait(0.005)
+                continue
+
+            start = time.perf_counter()
+            try:
+                with self.hooks.stage("detect", frames=len(batch)):
+                    results = detect(self.model, [frame for _, _, frame in batch], [feed.region for feed, _, _ in batch])
+            except Exception as e:
+                # One bad batch must not stop inference for every camera
+                self.failed_batches += 1
+                self.error = str(e)
+                self.busy_seconds += time.perf_counter() - start
+                continue
+            for (feed, captured_at, _), result in zip(batch, results):
+                try:
+                    with feed.hooks.stage("track"):
+                        result = feed.tracker.update(result)
+                    feed.record(captured_at, result)
+                except Exception as e:
+                    feed.error = str(e)
+            self.busy_seconds += time.perf_counter() - start
+            self.batches += 1
+            self.frames_processed += len(batch)
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        with self.lock:
+            feeds = list(self.feeds.values())
+        return {
+            "cameras": len(feeds),
+            "frames_processed": self.frames_processed,
+            "throughput_fps": self.frames_processed / elapsed if elapsed else 0.0,
+            "avg_batch_size": self.frames_processed / self.batches if self.batches else 0.0,
+            # Share of wall time spent in inference; close to 1.0 means the node is saturated
+            "utilization": self.busy_seconds / elapsed if elapsed else 0.0,
+            "failed_batches": self.failed_batches,
+            "error": self.error,
+            "per_camera": [feed.stats() for feed in feeds],
+        }
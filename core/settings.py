@@ -1,22 +1,200 @@
+import json
 import os
 
-# Base paths
-BASE_DIR = "d:/ML project/Bird Counting"
-DATA_DIR = os.path.join(BASE_DIR, "data")
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+# Every setting below can be overridden with a BIRD_<NAME> environment variable (see the end of this file),
+# e.g. BIRD_BATCH_SIZE=8, BIRD_ANNOTATE_VIDEO=false, BIRD_ROI_POLYGONS='{"cam-1": [[[0, 0], [100, 0], [100, 100]]]}'.
+# Importing this module has no side effects: directories are created by ensure_dirs(), and the model path
+# (which checks for fine-tuned weights on disk) is resolved on first use.
+
+# Base paths (default: the project root, wherever it is checked out)
+BASE_DIR = os.environ.get("BIRD_BASE_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.environ.get("BIRD_DATA_DIR", os.path.join(BASE_DIR, "data"))
+OUTPUT_DIR = os.environ.get("BIRD_OUTPUT_DIR", os.path.join(BASE_DIR, "output"))
+
+
+def ensure_dirs():
+    """Create the data / output directories (entry points call this, importing settings does not)."""
+    for path in (DATA_DIR, OUTPUT_DIR):
+        os.makedirs(path, exist_ok=True)
 
-# Ensure output directory exists
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # Model settings
+# MODEL_PATH: fine-tuned weights if they exist, else the nano COCO model (for speed).
+# It is resolved lazily in __getattr__ below, together with the settings derived from it:
+# TARGET_CLASS_IDS, ONNX_MODEL_PATH, ONNX_INT8_MODEL_PATH and OPENVINO_MODEL_PATH.
 CUSTOM_MODEL_PATH = os.path.join(OUTPUT_DIR, "chicken_model", "weights", "best.pt")
-MODEL_PATH = CUSTOM_MODEL_PATH if os.path.exists(CUSTOM_MODEL_PATH) else "yolov8n.pt" 
-# Using nano model for speed or fine-tuned if available
 CONFIDENCE_THRESHOLD = 0.3
 IOU_THRESHOLD = 0.5
 TRACKER_CONFIG = "bytetrack.yaml"
 
-# Class IDs
-# If using fine-tuned 'chicken_model', there is only 1 class (index 0: 'Chicken')
-# If using 'yolov8n.pt' (COCO), 'bird' is index 14.
-TARGET_CLASS_IDS = [0] if "chicken_model" in MODEL_PATH else [14]
+# Inference backend: "torch" (.pt weights), "onnx" / "onnx-int8" (ONNX Runtime) or "openvino".
+# Exported models are created next to the .pt weights on first use (see core/backends.py).
+INFERENCE_BACKEND = "torch"
+
+# Pipelining
+# Run decode, tracking and annotation/encoding as separate stages connected by bounded queues.
+# The queue size caps how many frames each stage may run ahead of the next one.
+PIPELINED_PROCESSING = True
+PIPELINE_QUEUE_SIZE = 8
+
+# Batched inference
+# Number of frames sent through YOLO in one forward pass. Tracking is still updated
+# frame by frame in order, so track IDs are the same for any batch size.
+BATCH_SIZE = 4
+
+# Frame skipping for static cameras
+# Detection runs at most on every INFERENCE_STRIDE-th frame. With MOTION_THRESHOLD set, a due frame
+# is only inferred if its mean pixel difference (0-255, on a MOTION_DOWNSCALE_WIDTH px wide gray copy)
+# to the last inferred frame reaches the threshold, or after MOTION_MAX_SKIP carried frames.
+# Skipped frames reuse the previous tracks. Higher stride / threshold = faster but less accurate.
+INFERENCE_STRIDE = 1
+MOTION_THRESHOLD = None  # e.g. 2.0 for fixed coop cameras, None disables motion gating
+MOTION_MAX_SKIP = 30
+MOTION_DOWNSCALE_WIDTH = 160
+
+# API job queue
+# Videos submitted to the API are processed by a pool of worker processes.
+MAX_CONCURRENT_JOBS = 2
+JOB_PROGRESS_INTERVAL = 0.5  # seconds between progress updates from a worker
+# Finished jobs (and their results) are forgotten after JOB_RETENTION_SECONDS, or sooner once more
+# than MAX_FINISHED_JOBS have finished; cached results can still be fetched again by re-uploading.
+JOB_RETENTION_SECONDS = 3600
+MAX_FINISHED_JOBS = 200
+
+# Model pool
+# Loaded + warmed-up model instances per process (every job worker holds its own pool).
+MODEL_POOL_SIZE = 1
+
+# Live streams (RTSP / cameras)
+# Stats are kept for a rolling window only, and IDs not seen for a whole window are forgotten.
+STREAM_WINDOW_SECONDS = 60
+STREAM_MAX_WINDOW_FRAMES = 60 * 30  # hard cap on rows kept per stream
+STREAM_RECONNECT_DELAY = 1.0  # seconds, doubled after every failed attempt
+STREAM_RECONNECT_MAX_DELAY = 30.0
+
+# Multi-camera scheduler
+# Frames from all cameras are interleaved into shared batches on one model.
+SCHEDULER_BATCH_SIZE = 8
+CAMERA_TARGET_FPS = 5.0  # default per camera, None = as fast as possible
+
+# Annotation
+# ANNOTATE_VIDEO = False is an analytics-only run: no drawing and no output video.
+# ANNOTATION_LABELS = False draws boxes without the per-bird "ID W:<weight>" text (fastest for dense frames).
+ANNOTATE_VIDEO = True
+ANNOTATION_LABELS = True
+
+# Result store
+# Per-frame and per-track results are kept in NumPy chunks of this many rows.
+RESULT_CHUNK_SIZE = 4096
+TRACKS_SAMPLE_SIZE = 20  # tracks returned in "tracks_sample" of the API response
+
+# Per-track weight estimates
+# Box areas are summarized per track in a log-spaced histogram with this many bins over this range (px^2).
+WEIGHT_SKETCH_BINS = 128
+WEIGHT_SKETCH_RANGE = (1.0, 1e7)
+WEIGHT_MIN_OBSERVATIONS = 5  # tracks seen in fewer frames get no estimate
+
+# Result cache
+# Finished analyses are cached by video content + model weights + the settings above.
+# The cache lives under OUTPUT_DIR so cached videos are served by /output as well.
+CACHE_DIR = os.path.join(OUTPUT_DIR, "cache")
+CACHE_MAX_BYTES = 5 * 1024**3  # least recently used entries are evicted beyond this
+
+# Chunked processing of long videos (core/chunked.py)
+# The video is split into one segment per worker; each segment starts CHUNK_OVERLAP_FRAMES early so
+# track IDs can be matched (box IoU >= CHUNK_MATCH_IOU) with the previous segment.
+CHUNK_WORKERS = os.cpu_count() or 1
+CHUNK_OVERLAP_FRAMES = 30
+CHUNK_MATCH_IOU = 0.5
+
+# Uploads
+# Uploads are written to DATA_DIR in chunks of UPLOAD_CHUNK_SIZE and hashed on the way (no second read for the cache key).
+# Larger uploads are rejected with 413. Leftover temp_input_* files older than TEMP_INPUT_MAX_AGE seconds
+# (e.g. from a crash) are removed when the API starts; normally they are removed as soon as their job finishes.
+UPLOAD_CHUNK_SIZE = 1024**2
+MAX_UPLOAD_BYTES = 4 * 1024**3
+TEMP_INPUT_MAX_AGE = 3600
+
+# Metrics
+# Prometheus-style metrics on /metrics (per-stage latencies, frames, queue depths, jobs, model load time).
+# METRICS_ENABLED = False swaps the pipeline hooks for no-ops.
+METRICS_ENABLED = True
+
+# Regions of interest and tiled inference (core/regions.py)
+# ROI_POLYGONS maps a source to the polygons that contain birds, in full-frame pixels:
+#   {"pen_a*.mp4": [[[0, 400], [1900, 400], [1900, 2100], [0, 2100]]], "cam-3": [...], "*": [...]}
+# Keys are fnmatch patterns on the video filename, stream id or camera id. Only the polygons' bounding box
+# is sent to the detector (and used for motion gating), pixels outside the polygons are blacked out.
+ROI_POLYGONS = {}
+# Tiled (SAHI-style) inference: the ROI is cut into TILE_SIZE x TILE_SIZE tiles overlapping by TILE_OVERLAP,
+# all tiles are detected in batches of TILE_BATCH_SIZE and boxes cut by a seam are merged (overlap over
+# the smaller box >= TILE_MERGE_THRESHOLD) before tracking. TILE_FULL_FRAME adds the whole ROI as one
+# more view so birds bigger than a tile are still found. TILE_SIZE = None disables tiling.
+# Accuracy vs throughput: a 3840x2160 frame is 1 forward pass untiled, 8 with 1280 tiles and 32 with
+# 640 tiles (+1 for the full frame). Smaller tiles find smaller birds; cropping to the pens cuts the
+# tile count in proportion to the area removed.
+TILE_SIZE = None
+TILE_OVERLAP = 0.2
+TILE_FULL_FRAME = True
+TILE_MERGE_THRESHOLD = 0.6
+TILE_BATCH_SIZE = 16
+
+# Video I/O (core/video_io.py)
+# VIDEO_READER: "opencv" (cv2.VideoCapture) or "pyav" (needs the optional PyAV package).
+# VIDEO_DECODE_THREADS: codec decode threads, 0 = the library's default. VIDEO_HW_ACCELERATION asks
+# OpenCV for hardware decoding where the build supports it (falls back to software otherwise).
+VIDEO_READER = "opencv"
+VIDEO_DECODE_THREADS = 0
+VIDEO_HW_ACCELERATION = False
+# VIDEO_WRITER: "ffmpeg" (H.264 through an ffmpeg subprocess, falls back to "opencv" when FFMPEG_BINARY
+# is missing), "opencv" (mp4v) or "none" (stats only: no annotation and no encoding at all).
+# VIDEO_CRF / VIDEO_PRESET: x264 quality (lower CRF = better, bigger) and speed vs size.
+# OUTPUT_WIDTH / OUTPUT_FPS: downscale / thin out the annotated video (None = same as the source).
+VIDEO_WRITER = "ffmpeg"
+FFMPEG_BINARY = "ffmpeg"
+VIDEO_CRF = 26
+VIDEO_PRESET = "veryfast"
+OUTPUT_WIDTH = None
+OUTPUT_FPS = None
+
+
+def _parse_env(value, default):
+    # Typed like the default; JSON for lists / dicts / tuples and for settings that default to None
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    if isinstance(default, str):
+        return value
+    parsed = json.loads(value)
+    return tuple(parsed) if isinstance(default, tuple) else parsed
+
+
+for _name, _default in list(globals().items()):
+    if _name.isupper() and f"BIRD_{_name}" in os.environ:
+        globals()[_name] = _parse_env(os.environ[f"BIRD_{_name}"], _default)
+
+
+def _model_path():
+    if "BIRD_MODEL_PATH" in os.environ:
+        return os.environ["BIRD_MODEL_PATH"]
+    return CUSTOM_MODEL_PATH if os.path.exists(CUSTOM_MODEL_PATH) else "yolov8n.pt"
+
+
+def __getattr__(name):
+    # Settings that depend on what is on disk, resolved on first access and then cached as plain globals
+    if name == "MODEL_PATH":
+        value = _model_path()
+    elif name == "TARGET_CLASS_IDS":
+        # Fine-tuned 'chicken_model' has only 1 class (index 0: 'Chicken'), 'yolov8n.pt' (COCO) has 'bird' at 14
+        if "BIRD_TARGET_CLASS_IDS" in os.environ:
+            value = json.loads(os.environ["BIRD_TARGET_CLASS_IDS"])
+        else:
+            value = [0] if "chicken_model" in __getattr__("MODEL_PATH") else [14]
+    elif name in ("ONNX_MODEL_PATH", "ONNX_INT8_MODEL_PATH", "OPENVINO_MODEL_PATH"):
+        suffix = {"ONNX_MODEL_PATH": ".onnx", "ONNX_INT8_MODEL_PATH": ".int8.onnx", "OPENVINO_MODEL_PATH": "_openvino_model"}[name]
+        value = os.environ.get(f"BIRD_{name}", os.path.splitext(__getattr__("MODEL_PATH"))[0] + suffix)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
@@ -0,0 +1,252 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import cv2
+import numpy as np
+from .backends import load_model
+from .metrics import hooks_for
+from .pipeline import detect
+from .regions import region_for
+from .settings import (
+    STREAM_WINDOW_SECONDS, STREAM_MAX_WINDOW_FRAMES,
+    STREAM_RECONNECT_DELAY, STREAM_RECONNECT_MAX_DELAY,
+)
+from .annotate import weight_proxies
+from .tracking import FrameTracker, tracked_boxes
+
+
+class StreamSource:
+    """Reads an RTSP / camera stream on a background thread and keeps only the newest frame.
+
+    If the consumer is slower than the camera, older frames are overwritten (and
+    counted as dropped) instead of queueing up, so processing stays real-time.
+    Lost connections are reopened with exponential backoff.
+    """
+
+    def __init__(self, url, reconnect_delay=STREAM_RECONNECT_DELAY, max_reconnect_delay=STREAM_RECONNECT_MAX_DELAY):
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.fps = 0.0
+        self.connected = False
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self._latest = None  # (frame_id, capture time, frame)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"stream:{self.url}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def read(self, timeout=1.0):
+        """Newest frame not handed out yet, or None if nothing arrived within `timeout`."""
+        with self._cond:
+            if self._latest is None:
+                self._cond.wait(timeout)
+            item, self._latest = self._latest, None
+        return item
+
+    def _open(self):
+        return cv2.VideoCapture(self.url)
+
+    def _pace(self):
+        # Live sources deliver frames at their own rate
+        pass
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            cap = self._open()
+            if not cap.isOpened():
+                cap.release()
+                self.connected = False
+                self.reconnects += 1
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            self.connected = True
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            frames_before = self.frames_read
+            while not self._stop.is_set():
+                success, frame = cap.read()
+                if not success:
+                    break
+                self._pace()
+                self.frames_read += 1
+                with self._cond:
+                    if self._latest is not None:
+                        self.frames_dropped += 1
+                    self._latest = (self.frames_read, time.time(), frame)
+                    self._cond.notify()
+            cap.release()
+            self.connected = False
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            if self.frames_read == frames_before:
+                # Opened but delivered nothing (silent endpoint, empty / corrupt file): back off too
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            else:
+                delay = self.reconnect_delay
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "connected": self.connected,
+            "fps": self.fps,
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "reconnects": self.reconnects,
+        }
+
+
+class FilePlaybackSource(StreamSource):
+    """Stand-in for a camera: plays a local video file in a loop at its native fps."""
+
+    def _open(self):
+        self._next_frame_at = time.monotonic()
+        return cv2.VideoCapture(self.url)
+
+    def _pace(self):
+        if self.fps > 0:
+            self._next_frame_at += 1.0 / self.fps
+            wait = self._next_frame_at - time.monotonic()
+            if wait > 0:
+                self._stop.wait(wait)
+
+
+def open_stream(url):
+    # Local files are replayed in real time, anything else is handed to OpenCV as a stream URL
+    if os.path.isfile(url):
+        return FilePlaybackSource(url)
+    return StreamSource(url)
+
+
+class RollingWindowStats:
+    """Count statistics over the last `window_seconds`, with bounded memory.
+
+    Replaces the ever-growing frame_data list and unique_ids set for streams:
+    per-frame rows live in a fixed-size deque and track IDs are forgotten once
+    they have not been seen for a whole window.
+    """
+
+    def __init__(self, window_seconds=STREAM_WINDOW_SECONDS, max_frames=STREAM_MAX_WINDOW_FRAMES):
+        self.window_seconds = window_seconds
+        self.frames = deque(maxlen=max_frames)  # (timestamp, bird_count, avg_weight_proxy)
+        self.last_seen = OrderedDict()  # track_id -> timestamp, oldest first
+
+    def add(self, timestamp, track_ids, weights):
+        self.frames.append((timestamp, len(track_ids), float(np.mean(weights)) if len(weights) else 0.0))
+        for track_id in track_ids:
+            self.last_seen[track_id] = timestamp
+            self.last_seen.move_to_end(track_id)
+        self._prune(timestamp)
+
+    def _prune(self, now):
+        cutoff = now - self.window_seconds
+        while self.frames and self.frames[0][0] < cutoff:
+            self.frames.popleft()
+        while self.last_seen:
+            track_id, seen = next(iter(self.last_seen.items()))
+            if seen >= cutoff:
+                break
+            self.last_seen.popitem(last=False)
+
+    def summary(self):
+        counts = [count for _, count, _ in self.frames]
+        weights = [weight for _, count, weight in self.frames if count]
+        return {
+            "window_seconds": self.window_seconds,
+            "frames": len(self.frames),
+            "current_count": counts[-1] if counts else 0,
+            "avg_count": float(np.mean(counts)) if counts else 0.0,
+            "max_count": max(counts, default=0),
+            "unique_ids": len(self.last_seen),
+            "avg_weight_proxy": float(np.mean(weights)) if weights else 0.0,
+        }
+
+
+class StreamCounter:
+    """Continuously counts birds on a live stream until stopped."""
+
+    def __init__(self, url, model=None, window_seconds=STREAM_WINDOW_SECONDS, source=None):
+        self.url = url
+        # Metrics label, the stream id in the API
+        self.hooks = hooks_for(source or url)
+        self.region = region_for(source or url)
+        self.source = open_stream(url)
+        self.model = model if model is not None else load_model()
+        self.tracker = FrameTracker()
+        self.window = RollingWindowStats(window_seconds)
+        self.frames_processed = 0
+        self.lag_seconds = 0.0
+        self.frames_failed = 0
+        self.error = None  # last per-frame error
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.source.start()
+        self._thread = threading.Thread(target=self._run, name=f"counter:{self.url}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.source.stop()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            item = self.source.read(timeout=1.0)
+            if item is None:
+                continue
+            _, captured_at, frame = item
+            try:
+                with self.hooks.stage("detect"):
+                    result = detect(self.model, [frame], [self.region])[0]
+                with self.hooks.stage("track"):
+                    result = self.tracker.update(result)
+            except Exception as e:
+                # One bad frame must not stop a 24/7 counter: record it and go on with the next frame
+                with self._lock:
+                    self.frames_failed += 1
+                    self.error = str(e)
+                continue
+
+            xywh, track_ids = tracked_boxes(result)
+
+            with self._lock:
+                self.window.add(captured_at, track_ids.tolist(), weight_proxies(xywh))
+                self.frames_processed += 1
+                self.lag_seconds = time.time() - captured_at
+            self.hooks.frame_done({"inferred": True})
+
+    def status(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "error": self.error,
+                "frames_failed": self.frames_failed,
+                "frames_processed": self.frames_processed,
+                "lag_seconds": self.lag_seconds,
+                "source": self.source.stats(),
+                "window": self.window.summary(),
+            }
@@ -0,0 +1,55 @@
+import numpy as np
+from .settings import TRACKER_CONFIG
+
+
+class FrameTracker:
+    """Tracker state for a single video, fed with detections one frame at a time.
+
+    Mirrors what `model.track(persist=True)` does internally, but keeps the tracker
+    separate from the model so detection can run on batches of frames (or on a
+    shared model) while tracks are still updated strictly in frame order.
+    The mirrored internals are those of the ultralytics version pinned in
+    requirements.txt; benchmarks/bench_batch_size.py checks the IDs against model.track().
+    """
+
+    def __init__(self, tracker_config=TRACKER_CONFIG):
+        # ultralytics / torch are only imported once a tracker is needed (cheap imports for the API)
+        import torch
+        from ultralytics.trackers.track import TRACKER_MAP
+        from ultralytics.utils import YAML, IterableSimpleNamespace
+        from ultralytics.utils.checks import check_yaml
+
+        self._as_tensor = torch.as_tensor
+        cfg = IterableSimpleNamespace(**YAML.load(check_yaml(tracker_config)))
+        if cfg.tracker_type not in TRACKER_MAP:
+            raise ValueError(f"Unsupported tracker type: {cfg.tracker_type}")
+        tracker_cls = TRACKER_MAP[cfg.tracker_type]
+        # ReID features / per-frame extras are taken from inside the predictor, only model.track() has them
+        if getattr(cfg, "with_reid", False) or hasattr(tracker_cls, "setup_predictor"):
+            raise ValueError(f"Tracker {tracker_config} needs model.track(), it cannot run on batched detections")
+        self.tracker = tracker_cls(args=cfg)
+
+    def reset(self):
+        self.tracker.reset()
+
+    def update(self, result):
+        # Same post-processing as ultralytics' on_predict_postprocess_end callback. The tracker sees
+        # every frame, also frames without detections, so lost tracks age out exactly as with model.track()
+        det = result.boxes.cpu().numpy()
+        tracks = self.tracker.update(det, result.orig_img, feats=None)
+        if len(tracks) == 0:
+            if any(not t.is_activated for t in self.tracker.tracked_stracks):
+                return result[:0]  # new tracks stay hidden until confirmed
+            return result
+        idx = tracks[:, -1].astype(int)
+        device = result.boxes.data.device
+        result = result[idx]
+        result.update(boxes=self._as_tensor(tracks[:, :-1], device=device))
+        return result
+
+
+def tracked_boxes(result):
+    """(N, 4) xywh boxes and (N,) track IDs of a tracked result, empty if nothing is tracked."""
+    if result.boxes.id is None:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    return result.boxes.xywh.cpu().numpy(), result.boxes.id.int().cpu().numpy()
@@ -0,0 +1,186 @@
+import shutil
+import subprocess
+import warnings
+
+import cv2
+import numpy as np
+from .settings import (
+    ANNOTATE_VIDEO, VIDEO_READER, VIDEO_DECODE_THREADS, VIDEO_HW_ACCELERATION,
+    VIDEO_WRITER, FFMPEG_BINARY, VIDEO_CRF, VIDEO_PRESET, OUTPUT_WIDTH, OUTPUT_FPS,
+)
+
+# Video readers / writers that can be chosen in settings (VIDEO_READER, VIDEO_WRITER)
+READERS = ("opencv", "pyav")
+WRITERS = ("ffmpeg", "opencv", "none")
+
+
+class OpenCVReader:
+    """cv2.VideoCapture with the codec's own decode threads and optional hardware decoding."""
+
+    def __init__(self, path, start_frame=0, threads=VIDEO_DECODE_THREADS, hw_acceleration=VIDEO_HW_ACCELERATION):
+        params = []
+        if threads:
+            params += [cv2.CAP_PROP_N_THREADS, int(threads)]
+        if hw_acceleration:
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        self.cap = cv2.VideoCapture(path, cv2.CAP_ANY, params) if params else cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise Exception(f"Could not open video: {path}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if start_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    def read(self, buffer=None):
+        # Decodes into `buffer` when it has the right shape (recycled frames), like cap.read
+        return self.cap.read(buffer)
+
+    def release(self):
+        self.cap.release()
+
+
+class PyAVReader:
+    """Decoding through PyAV (libav directly): frame-threaded decoding, no OpenCV build dependencies."""
+
+    def __init__(self, path, start_frame=0, threads=VIDEO_DECODE_THREADS):
+        # Needs PyAV (optional dependency)
+        import av
+
+        self.container = av.open(path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"  # frame + slice threads
+        if threads:
+            self.stream.thread_count = int(threads)
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 30)
+        self.frame_count = self.stream.frames
+        self.start_frame = start_frame
+        if start_frame:
+            # Jump to the keyframe before start_frame, read() drops the frames up to it
+            self.container.seek(int(start_frame / self.fps / self.stream.time_base), stream=self.stream, backward=True)
+        self.frames = self.container.decode(self.stream)
+
+    def read(self, buffer=None):
+        for frame in self.frames:
+            if self.start_frame and frame.time is not None and round(frame.time * self.fps) < self.start_frame:
+                continue
+            self.start_frame = 0
+            return True, frame.to_ndarray(format="bgr24")
+        return False, None
+
+    def release(self):
+        self.container.close()
+
+
+class OpenCVWriter:
+    """cv2.VideoWriter with the mp4v codec (small dependency footprint, large files, no browser playback)."""
+
+    def __init__(self, path, fps, size):
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def release(self):
+        self.writer.release()
+
+
+class FFmpegWriter:
+    """Raw BGR frames piped into an ffmpeg subprocess encoding H.264 (browser-playable, much smaller files).
+
+    Quality is set with the x264 CRF (lower is better, 18-28 is the useful range)
+    and the preset trades encode speed for file size. The moov atom is moved to
+    the front (+faststart) so /output can stream the file while it downloads.
+    """
+
+    def __init__(self, path, fps, size, crf=VIDEO_CRF, preset=VIDEO_PRESET, binary=FFMPEG_BINARY):
+        width, height = size
+        self.path = path
+        self.proc = subprocess.Popen([
+            binary, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps}", "-i", "-",
+            # yuv420p (needed by browsers) wants even dimensions
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-an", "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart", path,
+        ], stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame):
+        try:
+            # Straight from the frame's memory, no bytes copy for contiguous frames
+            self.proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg stopped while writing {self.path}: {self.proc.stderr.read().decode(errors='replace')}")
+
+    def release(self):
+        if self.proc.stdin.closed:
+            return
+        self.proc.stdin.close()
+        error = self.proc.stderr.read().decode(errors="replace")
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed writing {self.path}: {error}")
+
+
+class OutputVideo:
+    """The annotated output: frame rate reduction, downscaling and the encoder behind them.
+
+    With OUTPUT_FPS below the source frame rate only every `stride`-th frame is
+    written, and the pipeline skips annotating the others (wants()). With
+    OUTPUT_WIDTH frames are downscaled before they reach the encoder.
+    """
+
+    def __init__(self, writer, stride=1, size=None):
+        self.writer = writer
+        self.stride = stride
+        self.size = size  # None: written at the source resolution
+
+    def wants(self, frame_idx):
+        # frame_idx is 1-based, the first frame is always kept
+        return (frame_idx - 1) % self.stride == 0
+
+    def write(self, frame):
+        if self.size is not None:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        self.writer.write(frame)
+
+    def release(self):
+        self.writer.release()
+
+
+def writes_video(annotate=ANNOTATE_VIDEO, writer=VIDEO_WRITER):
+    """False for stats-only runs (no annotation, or VIDEO_WRITER = "none"): no output video is written."""
+    return bool(annotate) and writer != "none"
+
+
+def open_reader(path, start_frame=0, reader=VIDEO_READER):
+    if reader == "opencv":
+        return OpenCVReader(path, start_frame)
+    if reader == "pyav":
+        return PyAVReader(path, start_frame)
+    raise ValueError(f"Unknown video reader: {reader} (expected one of {', '.join(READERS)})")
+
+
+def open_writer(path, fps, size, writer=VIDEO_WRITER, output_width=OUTPUT_WIDTH, output_fps=OUTPUT_FPS):
+    """OutputVideo for the annotated video, or None for stats-only runs (writer="none")."""
+    if writer == "none":
+        return None
+    if writer not in WRITERS:
+        raise ValueError(f"Unknown video writer: {writer} (expected one of {', '.join(WRITERS)})")
+
+    stride = max(1, round(fps / output_fps)) if output_fps and fps else 1
+    out_size = None
+    width, height = size
+    if output_width and output_width < width:
+        out_size = (int(output_width), max(2, int(round(height * output_width / width / 2)) * 2))
+    out_fps = fps / stride
+    encoded_size = out_size or size
+
+    if writer == "ffmpeg" and shutil.which(FFMPEG_BINARY) is None:
+        warnings.warn(f"{FFMPEG_BINARY} not found, writing {path} with OpenCV (mp4v) instead of H.264")
+        writer = "opencv"
+    if writer == "ffmpeg":
+        return OutputVideo(FFmpegWriter(path, out_fps, encoded_size), stride, out_size)
+    return OutputVideo(OpenCVWriter(path, out_fps, encoded_size), stride, out_size)
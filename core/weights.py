@@ -0,0 +1,113 @@
+import numpy as np
+from .settings import WEIGHT_SKETCH_BINS, WEIGHT_SKETCH_RANGE, WEIGHT_MIN_OBSERVATIONS
+
+
+class TrackWeightAggregator:
+    """Incremental weight-proxy statistics per track, O(1) memory per track.
+
+    Every track gets one row of fixed-size arrays: Welford running count / mean /
+    M2 (variance) and a log-spaced histogram sketch of its box areas from which
+    percentiles are read. Updates are vectorized over all boxes of a frame, so a
+    multi-hour video costs the same memory per bird as a ten-second clip.
+    """
+
+    def __init__(self, bins=WEIGHT_SKETCH_BINS, area_range=WEIGHT_SKETCH_RANGE, capacity=256):
+        self.edges = np.geomspace(area_range[0], area_range[1], bins + 1)
+        self.rows = {}  # track_id -> row
+        self.track_ids = np.zeros(capacity, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.mean = np.zeros(capacity, dtype=np.float64)
+        self.m2 = np.zeros(capacity, dtype=np.float64)
+        self.hist = np.zeros((capacity, bins), dtype=np.uint32)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _grow(self):
+        # Double the capacity (amortized O(1) per new track)
+        for name in ("track_ids", "count", "mean", "m2", "hist"):
+            values = getattr(self, name)
+            setattr(self, name, np.concatenate([values, np.zeros_like(values)]))
+
+    def _rows_for(self, track_ids):
+        rows = np.empty(len(track_ids), dtype=np.int64)
+        for i, track_id in enumerate(track_ids.tolist()):
+            row = self.rows.get(track_id)
+            if row is None:
+                row = len(self.rows)
+                if row == len(self.count):
+                    self._grow()
+                self.rows[track_id] = row
+                self.track_ids[row] = track_id
+            rows[i] = row
+        return rows
+
+    def update(self, track_ids, weights):
+        """Add one frame's observations (track IDs are unique within a frame)."""
+        if not len(track_ids):
+            return
+        rows = self._rows_for(track_ids)
+        weights = np.asarray(weights, dtype=np.float64)
+
+        # Welford
+        self.count[rows] += 1
+        delta = weights - self.mean[rows]
+        self.mean[rows] += delta / self.count[rows]
+        self.m2[rows] += delta * (weights - self.mean[rows])
+
+        # Sketch
+        bins = np.clip(np.searchsorted(self.edges, weights, side="right") - 1, 0, self.hist.shape[1] - 1)
+        self.hist[rows, bins] += 1
+
+    def percentile(self, q, rows=None):
+        """Approximate q-th percentile (0-100) of every track, interpolated inside the log bins."""
+        rows = np.arange(len(self.rows)) if rows is None else rows
+        hist = self.hist[rows].astype(np.float64)
+        cum = hist.cumsum(axis=1)
+        target = q / 100.0 * self.count[rows]
+        idx = np.minimum((cum < target[:, None]).sum(axis=1), hist.shape[1] - 1)
+        before = np.where(idx > 0, cum[np.arange(len(rows)), idx - 1], 0.0)
+        in_bin = np.maximum(hist[np.arange(len(rows)), idx], 1.0)
+        frac = np.clip((target - before) / in_bin, 0.0, 1.0)
+        low, high = self.edges[idx], self.edges[idx + 1]
+        return low * (high / low) ** frac
+
+    def estimates_columns(self, min_observations=WEIGHT_MIN_OBSERVATIONS):
+        n = len(self.rows)
+        rows = np.flatnonzero(self.count[:n] >= min_observations)
+        count = self.count[rows]
+        std = np.sqrt(np.where(count > 1, self.m2[rows] / np.maximum(count - 1, 1), 0.0))
+        p25, median, p75 = (self.percentile(q, rows) for q in (25, 50, 75))
+        return {
+            "track_id": self.track_ids[rows],
+            "observations": count,
+            # Median is robust to frames where the box is cut off or merged with a neighbour
+            "weight_proxy": median,
+            "mean": self.mean[rows],
+            "std": std,
+            "p25": p25,
+            "p75": p75,
+            # Robust coefficient of variation: IQR / 1.349 ~ std for normal data, relative to the median
+            "uncertainty_index": (p75 - p25) / 1.349 / np.maximum(median, 1e-9),
+        }
+
+    def estimates(self, min_observations=WEIGHT_MIN_OBSERVATIONS):
+        columns = self.estimates_columns(min_observations)
+        return [
+            {
+                "track_id": track_id,
+                "weight_proxy": round(weight, 1),
+                "unit": "pixel_area",
+                "uncertainty_index": round(uncertainty, 3),
+                "observations": observations,
+            }
+            for track_id, weight, uncertainty, observations in zip(
+                columns["track_id"].tolist(), columns["weight_proxy"].tolist(),
+                columns["uncertainty_index"].tolist(), columns["observations"].tolist(),
+            )
+        ]
+
+    def write_csv(self, path, min_observations=WEIGHT_MIN_OBSERVATIONS):
+        import pandas as pd
+        pd.DataFrame(self.estimates_columns(min_observations)).to_csv(path, index=False)
+        return path
@@ -1,6 +1,7 @@
 import cv2
 import os
 import glob
+import numpy as np
 
 def create_video_from_images(image_folder, output_video_path, fps=5):
     images = sorted(glob.glob(os.path.join(image_folder, "*.jpg"))) + sorted(glob.glob(os.path.join(image_folder, "*.png")))
@@ -25,10 +26,35 @@ def create_video_from_images(image_folder, output_video_path, fps=5):
     video.release()
     print(f"Video saved to {output_video_path}")
 
+def create_synthetic_video(output_video_path, width=1280, height=720, n_birds=20, seconds=10, fps=30, seed=0):
+    """Render a clip of n_birds bird-like blobs wandering over a textured floor (for benchmarks)."""
+    rng = np.random.default_rng(seed)
+    # Static litter-like background, so only the birds change between frames
+    background = rng.integers(90, 140, size=(height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    background = cv2.resize(background, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    size = max(8, min(width, height) // 25)
+    pos = rng.uniform([size, size], [width - size, height - size], size=(n_birds, 2))
+    vel = rng.normal(0, size / 10, size=(n_birds, 2))
+    axes = (rng.uniform(0.8, 1.2, size=(n_birds, 2)) * [size, size * 0.7]).astype(int)
+    colors = rng.integers(200, 255, size=(n_birds, 3)).tolist()
+
+    video = cv2.VideoWriter(output_video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for _ in range(int(seconds * fps)):
+        frame = background.copy()
+        vel = 0.9 * vel + rng.normal(0, size / 20, size=vel.shape)
+        pos = np.clip(pos + vel, size, [width - size, height - size])
+        angles = np.degrees(np.arctan2(vel[:, 1], vel[:, 0]))
+        for (x, y), axis, angle, color in zip(pos.astype(int).tolist(), axes.tolist(), angles.tolist(), colors):
+            cv2.ellipse(frame, (x, y), tuple(axis), angle, 0, 360, color, -1)
+        video.write(frame)
+    video.release()
+    return output_video_path
+
 if __name__ == "__main__":
     # Adjust path based on project structure
     # Standard YOLO: train/images
-    PROJECT_ROOT = "d:/ML project/Bird Counting"
+    PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
     IMAGE_DIR = os.path.join(PROJECT_ROOT, "yolo_data", "images", "train")
     OUTPUT_VIDEO = os.path.join(PROJECT_ROOT, "data", "sample_video.mp4")
     
@@ -1,9 +1,18 @@
-from core.pipeline import VideoProcessor
+import argparse
 import os
 
-BASE_DIR = "d:/ML project/Bird Counting"
-INPUT_VIDEO = os.path.join(BASE_DIR, "data", "sample_video.mp4")
-OUTPUT_VIDEO = os.path.join(BASE_DIR, "output", "processed_sample_video.mp4")
+from core.settings import DATA_DIR, OUTPUT_DIR, ensure_dirs
+
+parser = argparse.ArgumentParser(description="Process one video with the default settings")
+parser.add_argument("input", nargs="?", default=os.path.join(DATA_DIR, "sample_video.mp4"))
+parser.add_argument("output", nargs="?", default=os.path.join(OUTPUT_DIR, "processed_sample_video.mp4"))
+args = parser.parse_args()
+INPUT_VIDEO = args.input
+OUTPUT_VIDEO = args.output
+ensure_dirs()
+
+# Imported after argument parsing, so --help does not wait for torch / ultralytics
+from core.pipeline import VideoProcessor
 
 print(f"Processing {INPUT_VIDEO}...")
 processor = VideoProcessor(INPUT_VIDEO, OUTPUT_VIDEO)
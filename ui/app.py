@@ -2,10 +2,12 @@ import streamlit as st
 import requests
 import pandas as pd
 import os
+import json
 import tempfile
+import time
 
 # API Configuration
-API_URL = "http://localhost:8000"
+API_URL = os.environ.get("BIRD_API_URL", "http://localhost:8000")
 
 st.set_page_config(page_title="Bird Counting & Weight Estimation", layout="wide")
 
@@ -24,6 +26,75 @@ iou_threshold = st.sidebar.slider("IOU Threshold", 0.0, 1.0, 0.5)
 # (User prompt said "Adjustable sliders", so ideally we pass them).
 # I'll stick to the basic requirement first: File Uploader.
 
+live_results = st.sidebar.checkbox("Live results (stream counts while processing)", value=False)
+
+
+def analyze_as_job(files):
+    # Submit a job and poll it until it is done
+    response = requests.post(f"{API_URL}/jobs", files=files)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    
+    progress_bar = st.progress(0.0, text="Queued")
+    while True:
+        state = requests.get(f"{API_URL}/jobs/{job_id}").json()
+        progress = state["progress"]
+        if progress["total_frames"]:
+            done = min(1.0, progress["frames_done"] / progress["total_frames"])
+            progress_bar.progress(done, text=f"{progress['frames_done']} / {progress['total_frames']} frames")
+        if state["status"] in ("completed", "failed"):
+            break
+        time.sleep(1)
+    
+    response = requests.get(f"{API_URL}/jobs/{job_id}/result")
+    if response.status_code != 200:
+        st.error(f"Error {response.status_code}: {response.text}")
+        return None
+    return response.json()
+
+
+def analyze_streaming(files, refresh_every=25):
+    # Read the NDJSON stream and grow the count chart as frames come in
+    response = requests.post(f"{API_URL}/analyze_video/stream", files=files, stream=True)
+    if response.status_code != 200:
+        st.error(f"Error {response.status_code}: {response.text}")
+        return None
+    
+    st.markdown("#### Bird Count Over Time")
+    chart = st.line_chart(pd.DataFrame({"bird_count": []}))
+    progress_bar = st.progress(0.0, text="Starting")
+    data = {"stats": []}
+    pending = []
+    total_frames = 0
+    
+    for line in response.iter_lines():
+        if not line:
+            continue
+        event = json.loads(line)
+        kind = event.pop("event")
+        if kind == "start":
+            data["video_url"] = event["video_url"]
+            total_frames = event["total_frames"]
+        elif kind == "frame":
+            data["stats"].append(event)
+            pending.append(event)
+            if len(pending) >= refresh_every:
+                chart.add_rows(pd.DataFrame(pending).set_index("timestamp")[["bird_count"]])
+                pending = []
+                if total_frames:
+                    progress_bar.progress(min(1.0, event["frame"] / total_frames), text=f"{event['frame']} / {total_frames} frames")
+        elif kind == "end":
+            data["skip_report"] = event["skip_report"]
+        elif kind == "error":
+            st.error(f"Processing failed: {event['detail']}")
+            return None
+    
+    if pending:
+        chart.add_rows(pd.DataFrame(pending).set_index("timestamp")[["bird_count"]])
+    progress_bar.progress(1.0, text="Done")
+    return data
+
+
 uploaded_file = st.sidebar.file_uploader("Upload CCTV Footage (MP4)", type=["mp4", "avi"])
 
 if uploaded_file is not None:
@@ -45,11 +116,12 @@ if uploaded_file is not None:
                 # NOTE: We are not passing sliders yet as `pipeline.py` reads from `settings.py`.
                 # To support sliders, we'd need to modify `pipeline.py` to accept args and `api/main.py` to accept query params.
                 # I will leave this as a basic implementation properly handling the FILE first.
-                response = requests.post(f"{API_URL}/analyze_video", files=files)
+                if live_results:
+                    data = analyze_streaming(files)
+                else:
+                    data = analyze_as_job(files)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    video_path = data.get("video_path") # Absolute path if local
+                if data is not None:
                     video_url = data.get("video_url")
                     stats = data.get("stats")
                     
@@ -59,7 +131,10 @@ if uploaded_file is not None:
                         st.subheader("Processed Footage")
                         # If running locally, we can display by path or URL.
                         # Using URL assuming API is serving it.
-                        st.video(f"{API_URL}{video_url}")
+                        if video_url:
+                            st.video(f"{API_URL}{video_url}")
+                        else:
+                            st.info("Stats-only mode: no annotated video was written.")
                         
                     # Charts
                     st.divider()
@@ -68,9 +143,10 @@ if uploaded_file is not None:
                     if stats:
                         df = pd.DataFrame(stats)
                         
-                        # Time Series Chart
-                        st.markdown("#### Bird Count Over Time")
-                        st.line_chart(df.set_index("timestamp")["bird_count"])
+                        # Time Series Chart (already drawn live when streaming)
+                        if not live_results:
+                            st.markdown("#### Bird Count Over Time")
+                            st.line_chart(df.set_index("timestamp")["bird_count"])
                         
                         # Stats Table
                         st.markdown("#### Detailed Stats")
@@ -79,9 +155,6 @@ if uploaded_file is not None:
                         # Weight estimates
                         avg_weight = df["avg_weight_proxy"].mean()
                         st.metric("Average Weight Proxy (Video)", f"{avg_weight:.2f}")
-
-                else:
-                    st.error(f"Error {response.status_code}: {response.text}")
                     
             except requests.exceptions.ConnectionError:
                 st.error("Could not connect to backend API. Is it running?")